@@ -0,0 +1,246 @@
+"""
+Synthetic directory-tree benchmark for the file search tools
+============================================================
+
+Measures `collect_required_xls` (../get_meters_info) and `copy_xls_files`
+(../search_and_move_dirs) without the production share.
+
+Steps performed
+---------------
+1. Generate a synthetic tree: `depth` levels of `fanout` folders, `files` filler
+   files per folder, required workbooks with mixed-case names, glob-matching
+   workbooks, and "Excluded files" folders that must be pruned.
+2. Run every strategy against the tree, each into a fresh destination folder.
+3. Record wall time, folder listings (`os.scandir` + `os.listdir` calls),
+   `os.stat` calls, Python peak memory (tracemalloc) and files found.
+4. Write all results as JSON.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+HERE = Path(__file__).resolve().parent
+sys.path.append(str(HERE.parent / "get_meters_info"))
+sys.path.append(str(HERE.parent / "search_and_move_dirs"))
+
+from getMedidores_mod2 import collect_required_xls  # noqa: E402
+from SearchAndMove import copy_xls_files  # noqa: E402
+
+REQUIRED_NAME = "names_of_meters.xls"
+GLOB_PATTERN = "*_medidor_*.xls"
+IGNORED_DIR = "Excluded files"
+
+
+# --------------------------------------------------------------------------- #
+# 1. Synthetic tree
+# --------------------------------------------------------------------------- #
+def generate_tree(
+    root: Path,
+    depth: int = 3,
+    fanout: int = 6,
+    files: int = 20,
+    required_ratio: float = 0.3,
+    ignored_ratio: float = 0.1,
+    file_size: int = 4096,
+    seed: int = 42,
+) -> Dict[str, int]:
+    """
+    Build a synthetic share under `root`.
+
+    Every folder gets `files` filler files. With probability `required_ratio`
+    a folder also gets the required workbook (random letter case) and a
+    '<x>_medidor_<n>.xls' workbook; with probability `ignored_ratio` it gets an
+    'Excluded files' subfolder holding a required workbook that must be skipped.
+    Half of the required workbooks share the same bytes, so dedup has work to do.
+
+    Returns
+    -------
+    Dict[str, int]
+        Counts of folders, files and expected matches.
+    """
+    rng = random.Random(seed)
+    shared_payload = b"M" * file_size
+    counts = {"folders": 0, "files": 0, "expected_matches": 0, "ignored_folders": 0}
+
+    def mixed_case(name: str) -> str:
+        return "".join(c.upper() if rng.random() < 0.5 else c for c in name)
+
+    def fill(folder: Path, level: int) -> None:
+        folder.mkdir(parents=True, exist_ok=True)
+        counts["folders"] += 1
+        for i in range(files):
+            (folder / f"data_{i:05d}.csv").write_bytes(b"x" * 64)
+            counts["files"] += 1
+        if rng.random() < required_ratio:
+            payload = shared_payload if rng.random() < 0.5 else os.urandom(file_size)
+            (folder / mixed_case(REQUIRED_NAME)).write_bytes(payload)
+            (folder / f"s{level}_medidor_{counts['folders']}.xls").write_bytes(os.urandom(file_size))
+            counts["files"] += 2
+            counts["expected_matches"] += 2
+        if rng.random() < ignored_ratio:
+            excluded = folder / IGNORED_DIR
+            excluded.mkdir(exist_ok=True)
+            (excluded / REQUIRED_NAME).write_bytes(shared_payload)
+            counts["files"] += 1
+            counts["ignored_folders"] += 1
+        if level < depth:
+            for j in range(fanout):
+                fill(folder / f"L{level}_{j:03d}", level + 1)
+
+    fill(root, 0)
+    counts["folders"] -= 1  # the root itself
+    return counts
+
+
+# --------------------------------------------------------------------------- #
+# 2. Instrumentation
+# --------------------------------------------------------------------------- #
+@contextlib.contextmanager
+def count_fs_calls(counters: Dict[str, int]):
+    """
+    Count os.scandir / os.listdir / os.stat calls (all threads) while active.
+    `os.walk` goes through `os.scandir`, so it is counted too.
+    """
+    lock = threading.Lock()
+    originals = {"scandir": os.scandir, "listdir": os.listdir, "stat": os.stat}
+
+    def wrap(name: str) -> Callable:
+        original = originals[name]
+
+        def counted(*args, **kwargs):
+            with lock:
+                counters[name] = counters.get(name, 0) + 1
+            return original(*args, **kwargs)
+        return counted
+
+    for name in originals:
+        setattr(os, name, wrap(name))
+    try:
+        yield counters
+    finally:
+        for name, original in originals.items():
+            setattr(os, name, original)
+
+
+def measure(name: str, run: Callable[[], Any], quiet: bool = True) -> Dict[str, Any]:
+    """
+    Run one strategy and return its metrics. `run` returns the number of files found.
+    """
+    counters: Dict[str, int] = {}
+    sink = io.StringIO()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with count_fs_calls(counters), contextlib.redirect_stdout(sink if quiet else sys.stdout):
+        found = run()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    listings = counters.get("scandir", 0) + counters.get("listdir", 0)
+    result = {
+        "strategy": name,
+        "seconds": round(elapsed, 4),
+        "dir_listings": listings,
+        "stat_calls": counters.get("stat", 0),
+        "peak_mb": round(peak / 1e6, 3),
+        "files_found": found,
+    }
+    print(f"  {name:<28} {elapsed:8.3f} s  listings={listings:<6} stats={result['stat_calls']:<7} "
+          f"peak={result['peak_mb']:.2f} MB  found={found}")
+    return result
+
+
+# --------------------------------------------------------------------------- #
+# 3. Strategies
+# --------------------------------------------------------------------------- #
+def run_strategies(src: Path, work: Path, workers: int, quiet: bool = True) -> List[Dict[str, Any]]:
+    """
+    Run every search / copy strategy against the tree at `src`.
+    """
+    required = (REQUIRED_NAME, GLOB_PATTERN)
+    ignore = (IGNORED_DIR,)
+    index_file = work / "file_index.json"
+    results = []
+
+    def collect(dest: str, **kwargs) -> Callable[[], int]:
+        def run() -> int:
+            kwargs.setdefault("verbose", False)
+            index = collect_required_xls(required, src, work / dest, ignore, case_sensitive=False, **kwargs)
+            return sum(len(v) for v in index.values())
+        return run
+
+    results.append(measure("collect/os.walk", collect("o_walk", walker="os.walk"), quiet))
+    results.append(measure(f"collect/parallel-{workers}",
+                           collect("o_par", walker="parallel", workers=workers), quiet))
+    results.append(measure("collect/index-cold",
+                           collect("o_idx1", workers=workers, index_path=index_file), quiet))
+    results.append(measure("collect/index-warm",
+                           collect("o_idx2", workers=workers, index_path=index_file), quiet))
+    results.append(measure("collect/sync-rerun",
+                           collect("o_walk", walker="parallel", workers=workers, copy_mode="sync"), quiet))
+    results.append(measure("collect/dedup-hardlink",
+                           collect("o_dedup", walker="parallel", workers=workers, copy_mode="dedup-hardlink"), quiet))
+    results.append(measure("collect/verbose-os.walk",
+                           collect("o_verbose", walker="os.walk", verbose=True), quiet))
+
+    def search_and_move() -> int:
+        copy_xls_files(list(required), str(src), str(work / "o_flat"), workers=workers)
+        return len(os.listdir(work / "o_flat"))
+
+    results.append(measure("search_and_move/copy_xls", search_and_move, quiet))
+    return results
+
+
+# --------------------------------------------------------------------------- #
+# Example usage
+# --------------------------------------------------------------------------- #
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the file search tools on a synthetic tree.")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fanout", type=int, default=6)
+    parser.add_argument("--files", type=int, default=20, help="Filler files per folder")
+    parser.add_argument("--required-ratio", type=float, default=0.3)
+    parser.add_argument("--ignored-ratio", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tree", default=None, help="Reuse / create the tree here instead of a temp folder")
+    parser.add_argument("--out", default="bench_file_search.json")
+    parser.add_argument("--show-output", action="store_true", help="Do not silence the scripts' own prints")
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_file_search_"))
+    try:
+        src = Path(args.tree) if args.tree else tmp / "src"
+        if not src.exists():
+            print(f"Generating tree in {src} ...")
+            tree = generate_tree(src, args.depth, args.fanout, args.files,
+                                 args.required_ratio, args.ignored_ratio, seed=args.seed)
+        else:
+            tree = {"reused": 1}
+        print(f"Tree: {tree}\n")
+
+        results = run_strategies(src, tmp / "work", args.workers, quiet=not args.show_output)
+
+        report = {
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "params": vars(args),
+            "tree": tree,
+            "results": results,
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.out}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
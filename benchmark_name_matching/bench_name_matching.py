@@ -0,0 +1,450 @@
+"""
+Synthetic benchmark and accuracy suite for the name matching tools
+==================================================================
+
+Measures speed and quality of
+- `fuzzy_match_files` (../get_data_from_PME/matching_names_ML.py), every method
+- `homologate` (../get_noms_from_yaml/homologate_names_v2.py) with the rule file
+- the clustering modes of ../grouping_names/clustering_names_with_ml.py
+without the confidential production names.
+
+Steps performed
+---------------
+1. Generate synthetic signal / meter names from substation, voltage, bay and
+   measurement parts, and two noisy copies of each: accents dropped,
+   abbreviations ("Potencia Activa" -> "Pot. Act"), typos, upper case, and a
+   2-character prefix code on the file 2 side. Every pair of copies is a
+   ground-truth match; extra file 2 names without a partner are distractors.
+2. Generate collected / AF tables for the homologation rules (bus ids,
+   numeric cell codes with small offsets) with known pairs.
+3. Run every strategy and record wall time, throughput (names/s, pairs/s),
+   Python peak memory (tracemalloc), precision and recall.
+4. Write all results as JSON.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import unicodedata
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import pandas as pd
+from sklearn.metrics.cluster import pair_confusion_matrix
+
+HERE = Path(__file__).resolve().parent
+sys.path.append(str(HERE.parent / "get_data_from_PME"))
+sys.path.append(str(HERE.parent / "get_noms_from_yaml"))
+sys.path.append(str(HERE.parent / "grouping_names"))
+
+from matching_names_ML import fuzzy_match_files  # noqa: E402
+from homologate_names_v2 import homologate  # noqa: E402
+from homologation_rules import load_rules  # noqa: E402
+from clustering_names_with_ml import kmeans_clustering, lsh_graph_clustering, minibatch_clustering  # noqa: E402
+
+RULES_FILE = HERE.parent / "get_noms_from_yaml" / "homologation_rules.yaml"
+
+SUBSTATIONS = [
+    "Santa Rosa", "Chimbote", "Paramonga", "Huacho", "Zapallal", "Ventanilla", "San Juan",
+    "Chilca", "Independencia", "Ica", "Marcona", "Socabaya", "Moquegua", "Tintaya", "Puno",
+    "Huánuco", "Tingo María", "Cajamarca", "Ñaña", "Piura", "Talara", "Trujillo", "Cantera",
+    "Pomacocha", "Carhuamayo", "Oroya", "Vizcarra", "Conococha", "Aguaytía", "Pucallpa",
+]
+VOLTAGES = ["10", "22.9", "60", "138", "220", "500"]
+MEASUREMENTS = [
+    "Potencia Activa", "Potencia Reactiva", "Tensión Fase A", "Tensión Fase B", "Tensión Fase C",
+    "Corriente Fase A", "Corriente Fase B", "Corriente Fase C", "Energía Activa", "Energía Reactiva",
+    "Frecuencia", "Factor de Potencia",
+]
+ABBREVIATIONS = {
+    "Subestación": "SE", "Potencia": "Pot.", "Activa": "Act", "Reactiva": "React", "Tensión": "V",
+    "Corriente": "I", "Energía": "E", "Frecuencia": "Frec", "Factor de Potencia": "FP", "Celda": "C",
+}
+PREFIX_CODES = ["Z1", "Z2", "M1", "M3", "P0", "X9"]
+
+
+# --------------------------------------------------------------------------- #
+# 1. Synthetic names
+# --------------------------------------------------------------------------- #
+def strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def add_typo(text: str, rng: random.Random) -> str:
+    """
+    One random edit: substitution, deletion, insertion or swap of neighbours.
+    """
+    if len(text) < 3:
+        return text
+    i = rng.randrange(1, len(text) - 1)
+    kind = rng.randrange(4)
+    letter = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    if kind == 0:
+        return text[:i] + letter + text[i + 1:]
+    if kind == 1:
+        return text[:i] + text[i + 1:]
+    if kind == 2:
+        return text[:i] + letter + text[i:]
+    return text[:i - 1] + text[i] + text[i - 1] + text[i + 1:]
+
+
+def noisy_copy(name: str, rng: random.Random, accent_rate: float, abbreviation_rate: float,
+               typo_rate: float, upper_rate: float) -> str:
+    """
+    Copy of a base name with the kinds of noise seen between PME and Z-Measure.
+    """
+    if rng.random() < abbreviation_rate:
+        for long, short in ABBREVIATIONS.items():
+            if long in name and rng.random() < 0.6:
+                name = name.replace(long, short)
+    if rng.random() < accent_rate:
+        name = strip_accents(name)
+    while rng.random() < typo_rate:
+        name = add_typo(name, rng)
+    if rng.random() < upper_rate:
+        name = name.upper()
+    return name
+
+
+def generate_name_corpus(
+    n: int = 2000,
+    distractor_ratio: float = 0.2,
+    accent_rate: float = 0.5,
+    abbreviation_rate: float = 0.3,
+    typo_rate: float = 0.3,
+    upper_rate: float = 0.1,
+    seed: int = 42,
+) -> Dict[str, Any]:
+    """
+    Build two name lists with known pairs.
+
+    Returns
+    -------
+    Dict[str, Any]
+        'names1' (file 1 lines), 'names2' (file 2 lines, with a 2-character
+        prefix code, shuffled, plus distractors), 'truth' (file 1 line ->
+        file 2 line) and 'groups' (base id of every name of both lists, for
+        clustering; distractors get their own ids).
+    """
+    rng = random.Random(seed)
+    bases = set()
+    target = n + int(n * distractor_ratio)
+    while len(bases) < target:
+        bases.add(f"Subestación {rng.choice(SUBSTATIONS)} {rng.choice(VOLTAGES)}kV "
+                  f"Celda {rng.randrange(1, 60):02d} {rng.choice(MEASUREMENTS)}")
+    bases = sorted(bases)
+    rng.shuffle(bases)
+
+    names1, names2, truth, groups = [], [], {}, {}
+    for base_id, base in enumerate(bases):
+        noise = (rng, accent_rate, abbreviation_rate, typo_rate, upper_rate)
+        b = rng.choice(PREFIX_CODES) + noisy_copy(base, *noise)
+        if b in groups:
+            continue
+        if base_id < n:
+            a = noisy_copy(base, *noise)
+            if a in groups or a in truth:
+                continue
+            names1.append(a)
+            truth[a] = b
+            groups[a] = base_id
+        names2.append(b)
+        groups[b] = base_id
+    rng.shuffle(names2)
+    return {"names1": names1, "names2": names2, "truth": truth, "groups": groups}
+
+
+def generate_homologation_tables(n: int = 2000, distractor_ratio: float = 0.2, code_noise: float = 0.3,
+                                 seed: int = 42) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, str]]:
+    """
+    Build collected / AF tables in the layout homologate() expects.
+
+    Every collected row has one AF partner: its idBarra is part of the AF
+    BAHIA and its Cellcode digits equal the IDELEMENT digits, or differ by 1-2
+    in a `code_noise` share of the rows (tolerance rule). Extra AF rows are
+    distractors on the same buses.
+
+    Returns
+    -------
+    Tuple[pd.DataFrame, pd.DataFrame, Dict[str, str]]
+        collected_df (index 'nombre'), af_df (index 'BAHIA') and the truth
+        (nombre -> BAHIA).
+    """
+    rng = random.Random(seed)
+    buses = [f"{strip_accents(s).upper().replace(' ', '')[:4]}{v.replace('.', '')}"
+             for s in SUBSTATIONS for v in VOLTAGES]
+    used = set()
+    collected, af, truth = [], [], {}
+    total = n + int(n * distractor_ratio)
+    while len(af) < total:
+        bus = rng.choice(buses)
+        code = rng.randrange(100, 1000)
+        if (bus, code) in used:
+            continue
+        used.add((bus, code))
+        bahia = f"{bus}-B{code}"
+        af.append({"BAHIA": bahia, "IDELEMENT": f"E{code}", "NOMBRESUBESTACION": bus[:4]})
+        if len(af) <= n:
+            offset = rng.choice((-2, -1, 1, 2)) if rng.random() < code_noise else 0
+            nombre = f"{bus[:4].lower()} celda {len(af)}"
+            collected.append({"nombre": nombre, "idBarra": bus, "Cellcode": f"C{code + offset}"})
+            truth[nombre] = bahia
+    rng.shuffle(af)
+    return (pd.DataFrame(collected).set_index("nombre"), pd.DataFrame(af).set_index("BAHIA"), truth)
+
+
+# --------------------------------------------------------------------------- #
+# 2. Instrumentation and scoring
+# --------------------------------------------------------------------------- #
+def measure(name: str, run: Callable[[], Dict[str, Any]], n_names: int, n_pairs: int,
+            quiet: bool = True) -> Dict[str, Any]:
+    """
+    Run one strategy and return its metrics. `run` returns its quality metrics.
+    """
+    sink = io.StringIO()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sink if quiet else sys.stdout):
+        quality = run()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "strategy": name,
+        "seconds": round(elapsed, 4),
+        "names_per_s": round(n_names / elapsed, 1),
+        "pairs_per_s": round(n_pairs / elapsed, 1),
+        "peak_mb": round(peak / 1e6, 3),
+        **quality,
+    }
+    print(f"  {name:<26} {elapsed:8.3f} s  {result['names_per_s']:>10.1f} names/s  "
+          f"peak={result['peak_mb']:8.2f} MB  precision={quality['precision']:.3f}  recall={quality['recall']:.3f}")
+    return result
+
+
+def pair_scores(predicted: Dict[str, str], truth: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Precision and recall of predicted pairs against the ground truth.
+    """
+    correct = sum(1 for a, b in predicted.items() if truth.get(a) == b)
+    return {
+        "predicted": len(predicted),
+        "correct": correct,
+        "precision": round(correct / len(predicted), 4) if predicted else 0.0,
+        "recall": round(correct / len(truth), 4) if truth else 0.0,
+    }
+
+
+def cluster_scores(labels: List[int], groups: List[int]) -> Dict[str, Any]:
+    """
+    Pairwise precision / recall: of the name pairs put in the same cluster,
+    how many share a base name, and of the pairs sharing a base name, how many
+    were put together.
+    """
+    # Rows: same base name or not; columns: same cluster or not
+    (_, false_join), (false_split, together) = pair_confusion_matrix(groups, labels)
+    return {
+        "clusters": len(set(labels)),
+        "precision": round(together / (together + false_join), 4) if together + false_join else 0.0,
+        "recall": round(together / (together + false_split), 4) if together + false_split else 0.0,
+    }
+
+
+def read_matches(output_path: Path, threshold: int) -> Dict[str, str]:
+    """
+    Parse a fuzzy_match_files output file, keeping pairs with score >= threshold.
+    """
+    matches = {}
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f.readlines()[2:]:
+            score, rest = line.rstrip("\n").split("% | ", 1)
+            s1, s2 = rest.split("  -->  ", 1)
+            if s2 != "None" and int(score) >= threshold:
+                matches[s1] = s2
+    return matches
+
+
+def assert_same_matches(expected_path: Path, actual_path: Path):
+    """
+    Fail when two fuzzy_match_files outputs differ, naming the first differing line.
+    """
+    expected = expected_path.read_text(encoding="utf-8").splitlines()
+    actual = actual_path.read_text(encoding="utf-8").splitlines()
+    for line_no, (a, b) in enumerate(zip(expected, actual), start=1):
+        if a != b:
+            raise AssertionError(f"{actual_path.name} differs from {expected_path.name} at line {line_no}: "
+                                 f"{b!r} != {a!r}")
+    if len(expected) != len(actual):
+        raise AssertionError(f"{actual_path.name} has {len(actual)} lines, {expected_path.name} has {len(expected)}")
+
+
+def check_vectorized_equivalence(work: Path, n: int = 600, typo_rate: float = 0.5, seeds=(1, 2),
+                                 thresholds=(0, 50, 90), workers: int = 1):
+    """
+    The "vectorized" method must give exactly the "all-pairs" output (same
+    scores, same greedy assignment). Runs both on seeded noisy corpora, where
+    .5 raw ratios are common, and raises AssertionError on the first difference.
+    """
+    for seed in seeds:
+        corpus = generate_name_corpus(n, typo_rate=typo_rate, seed=seed)
+        file1, file2 = work / f"eq_names1_{seed}.txt", work / f"eq_names2_{seed}.txt"
+        file1.write_text("\n".join(corpus["names1"]), encoding="utf-8")
+        file2.write_text("\n".join(corpus["names2"]), encoding="utf-8")
+        for threshold in thresholds:
+            outputs = {}
+            for method in ("all-pairs", "vectorized"):
+                outputs[method] = work / f"eq_{method}_{seed}_{threshold}.txt"
+                with contextlib.redirect_stdout(io.StringIO()):
+                    fuzzy_match_files(str(file1), str(file2), str(outputs[method]), threshold,
+                                      method=method, workers=workers)
+            assert_same_matches(outputs["all-pairs"], outputs["vectorized"])
+            print(f"  vectorized == all-pairs  seed={seed} threshold={threshold}")
+
+
+# --------------------------------------------------------------------------- #
+# 3. Strategies
+# --------------------------------------------------------------------------- #
+def run_fuzzy_strategies(corpus: Dict[str, Any], work: Path, threshold: int, workers: int,
+                         max_all_pairs: int, quiet: bool = True) -> List[Dict[str, Any]]:
+    """
+    Run every fuzzy_match_files method on the corpus.
+    """
+    file1, file2 = work / "names1.txt", work / "names2.txt"
+    file1.write_text("\n".join(corpus["names1"]), encoding="utf-8")
+    file2.write_text("\n".join(corpus["names2"]), encoding="utf-8")
+    n1, n2 = len(corpus["names1"]), len(corpus["names2"])
+    results = []
+
+    def fuzzy(method: str, **kwargs) -> Callable[[], Dict[str, Any]]:
+        def run() -> Dict[str, Any]:
+            out = work / f"related_{method}.txt"
+            fuzzy_match_files(str(file1), str(file2), str(out), threshold, method=method, **kwargs)
+            return pair_scores(read_matches(out, threshold), corpus["truth"])
+        return run
+
+    if n1 <= max_all_pairs:
+        results.append(measure("fuzzy/all-pairs", fuzzy("all-pairs"), n1, n1 * n2, quiet))
+    else:
+        print(f"  fuzzy/all-pairs            skipped (more than {max_all_pairs} names, use --max-all-pairs)")
+    results.append(measure("fuzzy/ngram", fuzzy("ngram"), n1, n1 * n2, quiet))
+    results.append(measure(f"fuzzy/vectorized-{workers}", fuzzy("vectorized", workers=workers), n1, n1 * n2, quiet))
+    if n1 <= max_all_pairs:
+        assert_same_matches(work / "related_all-pairs.txt", work / "related_vectorized.txt")
+    results.append(measure(f"fuzzy/optimal-{workers}", fuzzy("optimal", workers=workers), n1, n1 * n2, quiet))
+
+    # First run fills the memo; the measured rerun finds nothing changed
+    memo = work / "match_memo.json"
+    with contextlib.redirect_stdout(io.StringIO() if quiet else sys.stdout):
+        fuzzy("vectorized", workers=workers, memo_path=str(memo))()
+    results.append(measure("fuzzy/memo-rerun", fuzzy("vectorized", workers=workers, memo_path=str(memo)),
+                           n1, n1 * n2, quiet))
+    return results
+
+
+def run_homologation(n: int, distractor_ratio: float, seed: int, quiet: bool = True) -> List[Dict[str, Any]]:
+    """
+    Run homologate() with the default rule file on synthetic tables.
+    """
+    collected_df, af_df, truth = generate_homologation_tables(n, distractor_ratio, seed=seed)
+    rules = load_rules(str(RULES_FILE))
+
+    def run() -> Dict[str, Any]:
+        related_ones = homologate(collected_df, af_df, rules)[0]
+        return pair_scores(related_ones, truth)
+
+    return [measure("homologate/rules", run, len(collected_df), len(collected_df) * len(af_df), quiet)]
+
+
+def run_clustering(corpus: Dict[str, Any], work: Path, batch_size: int, quiet: bool = True) -> List[Dict[str, Any]]:
+    """
+    Cluster the names of both lists (file 2 without its prefix code) and score
+    the clusters against the base names. KMeans modes get the true number of
+    base names as n_clusters.
+    """
+    names = corpus["names1"] + corpus["names2"]
+    groups = [corpus["groups"][name] for name in names]
+    texts = corpus["names1"] + [name[2:] for name in corpus["names2"]]
+    n_groups = len(set(groups))
+    parquet_path = work / "names.parquet"
+    pd.DataFrame({"Nombre Señal": texts}).to_parquet(parquet_path, index=False)
+    n = len(texts)
+    results = []
+
+    def scored(cluster: Callable[[], pd.DataFrame]) -> Callable[[], Dict[str, Any]]:
+        return lambda: cluster_scores(cluster()["cluster"].tolist(), groups)
+
+    results.append(measure("cluster/kmeans", scored(lambda: kmeans_clustering(texts, n_groups)), n, n, quiet))
+    results.append(measure("cluster/minibatch", scored(lambda: pd.read_parquet(minibatch_clustering(
+        str(parquet_path), "Nombre Señal", n_groups, str(work / "labels.parquet"),
+        batch_size=max(batch_size, n_groups)))), n, n, quiet))
+    results.append(measure("cluster/lsh-graph", scored(lambda: lsh_graph_clustering(texts)), n, n, quiet))
+    return results
+
+
+# --------------------------------------------------------------------------- #
+# Example usage
+# --------------------------------------------------------------------------- #
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the name matching tools on synthetic names.")
+    parser.add_argument("--names", type=int, default=1000, help="Names with a true partner")
+    parser.add_argument("--distractor-ratio", type=float, default=0.2, help="Extra names without a partner")
+    parser.add_argument("--accent-rate", type=float, default=0.5)
+    parser.add_argument("--abbreviation-rate", type=float, default=0.3)
+    parser.add_argument("--typo-rate", type=float, default=0.3, help="Chance of each additional typo")
+    parser.add_argument("--threshold", type=int, default=70, help="Minimum fuzzy score counted as a match")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for the vectorized / optimal methods")
+    parser.add_argument("--max-all-pairs", type=int, default=3000, help="Skip the all-pairs method above this size")
+    parser.add_argument("--batch-size", type=int, default=2000, help="Batch size of the minibatch clustering")
+    parser.add_argument("--only", choices=("fuzzy", "homologate", "cluster"), action="append",
+                        help="Run only these suites (repeatable)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="bench_name_matching.json")
+    parser.add_argument("--show-output", action="store_true", help="Do not silence the scripts' own prints")
+    parser.add_argument("--check-equivalence", action="store_true",
+                        help="Only check that the vectorized method equals all-pairs on seeded corpora")
+    args = parser.parse_args()
+
+    if args.check_equivalence:
+        tmp = Path(tempfile.mkdtemp(prefix="bench_name_matching_"))
+        try:
+            check_vectorized_equivalence(tmp, workers=args.workers)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        sys.exit(0)
+
+    suites = args.only or ["fuzzy", "homologate", "cluster"]
+    quiet = not args.show_output
+    tmp = Path(tempfile.mkdtemp(prefix="bench_name_matching_"))
+    try:
+        corpus = generate_name_corpus(args.names, args.distractor_ratio, args.accent_rate,
+                                      args.abbreviation_rate, args.typo_rate, seed=args.seed)
+        sizes = {"names1": len(corpus["names1"]), "names2": len(corpus["names2"]), "true_pairs": len(corpus["truth"])}
+        print(f"Corpus: {sizes}\n")
+
+        results = []
+        if "fuzzy" in suites:
+            results += run_fuzzy_strategies(corpus, tmp, args.threshold, args.workers, args.max_all_pairs, quiet)
+        if "homologate" in suites:
+            results += run_homologation(args.names, args.distractor_ratio, args.seed, quiet)
+        if "cluster" in suites:
+            results += run_clustering(corpus, tmp, args.batch_size, quiet)
+
+        report = {
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "params": vars(args),
+            "corpus": sizes,
+            "results": results,
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nResults written to {args.out}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
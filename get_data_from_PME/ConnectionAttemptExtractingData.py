@@ -1,8 +1,106 @@
+import os
+import shutil
 import pyodbc
 import pandas as pd
 from datetime import datetime, timedelta
 
-def get_pme_report(source: str, measurements: list, start_time: str, end_time: str) -> pd.DataFrame:
+from pme_pool import ConnectionPool
+
+# Connection string (update with your details)
+CONN_STR = (
+    r'DRIVER={ODBC Driver 18 for SQL Server};'
+    r'SERVER=SERVER;'   # Data removed for confidentiality
+    r'DATABASE=DATABASE;'   # Data removed for confidentiality
+    r'UID=UID;' # Data removed for confidentiality
+    r'PWD=PWD;' # Data removed for confidentiality
+    r'Trusted_Connection=no;'  # Explicitly use SQL Authentication
+    r'Encrypt=yes;'  # Enable encryption for security
+    r'TrustServerCertificate=yes;'
+    r'Connection Timeout=30;'  # Increase timeout to 30 seconds
+)
+
+# Requested times are shifted by QUERY_OFFSET before querying, and rows read
+# from PME are shifted back by LOCAL_OFFSET to match local time
+QUERY_OFFSET = timedelta(hours=5, minutes=15)
+LOCAL_OFFSET = pd.Timedelta(hours=5)
+
+def change_to_local_time(dt_str):
+    # Parse to datetime
+    dt = datetime.strptime(dt_str, "%Y-%m-%d %H:%M:%S")
+
+    # Offset by -5 hours
+    offset_dt = dt + QUERY_OFFSET
+
+    # Convert back to string
+    return offset_dt.strftime("%Y-%m-%d %H:%M:%S")
+
+# SQL Server accepts at most 2100 bound parameters per statement
+MAX_QUERY_PARAMS = 2000
+
+# Source / Quantity tables, loaded once per session and connection string
+_ID_TABLES = {}
+
+def run_with_connection(work, pool: ConnectionPool = None):
+    """
+    work(conn) on a pooled connection, or on a new connection closed afterwards.
+    """
+    if pool is not None:
+        return pool.run(work)
+    conn = pyodbc.connect(CONN_STR)
+    try:
+        return work(conn)
+    finally:
+        conn.close()
+
+def load_id_tables(pool: ConnectionPool = None, refresh: bool = False) -> dict:
+    """
+    Reads the PME Source and Quantity tables once per session (cached by
+    connection string), so queries can filter DataLog2 by ID without joins.
+
+    Parameters:
+    - pool: optional ConnectionPool
+    - refresh: bool, read the tables again (e.g. after meters were added)
+
+    Returns:
+    - dict with 'source_ids' / 'quantity_ids' ({name: [IDs]}) and
+      'source_names' / 'quantity_names' ({ID: name})
+    """
+    conn_str = pool.conn_str if pool is not None else CONN_STR
+    if refresh or conn_str not in _ID_TABLES:
+        sources, quantities = run_with_connection(
+            lambda conn: (pd.read_sql("SELECT ID, Name FROM Source", conn),
+                          pd.read_sql("SELECT ID, Name FROM Quantity", conn)), pool)
+        tables = {}
+        for kind, df in (('source', sources), ('quantity', quantities)):
+            tables[f'{kind}_ids'] = {name: group.tolist() for name, group in df.groupby('Name', sort=False)['ID']}
+            tables[f'{kind}_names'] = dict(zip(df['ID'], df['Name']))
+        _ID_TABLES[conn_str] = tables
+        print(f"[PME] ID tables loaded: {len(sources)} sources, {len(quantities)} quantities")
+    return _ID_TABLES[conn_str]
+
+def resolve_ids(names: list, name_to_ids: dict, kind: str) -> list:
+    """
+    IDs for the given names, warning about names that do not exist in PME.
+    """
+    missing = [name for name in names if name not in name_to_ids]
+    if missing:
+        print(f"[WARN] {len(missing)} {kind} name(s) not found in PME: {missing[:10]}")
+    return [id_ for name in dict.fromkeys(names) for id_ in name_to_ids.get(name, [])]
+
+def name_rows(df: pd.DataFrame, ids: dict) -> pd.DataFrame:
+    """
+    Replaces the SourceID / QuantityID columns of a query result by Device /
+    Measurement names.
+    """
+    df = df.assign(Device=df['SourceID'].map(ids['source_names']),
+                   Measurement=df['QuantityID'].map(ids['quantity_names']))
+    return df.drop(columns=['SourceID', 'QuantityID'])
+
+def placeholders(n: int) -> str:
+    return ", ".join("?" * n)
+
+def get_pme_report(source: str, measurements: list, start_time: str, end_time: str,
+                   pool: ConnectionPool = None) -> pd.DataFrame:
     """
     Fetch PME tabular report data as a pandas DataFrame, adjusted for 5-hour offset and pivoted.
     
@@ -11,78 +109,50 @@ def get_pme_report(source: str, measurements: list, start_time: str, end_time: s
     - measurements: list, measurement names (e.g., ['Vln A', 'Vln B'])
     - start_time: str, start of reporting period (e.g., '2025-08-01 00:00')
     - end_time: str, end of reporting period (e.g., '2025-08-31 23:59')
+    - pool: optional ConnectionPool; its warm connections are reused (and
+      reconnected if dropped) instead of opening a new connection per call
     
     Returns:
     - pandas DataFrame with Time as rows and Measurements as columns (pivoted wide format)
     """
 
-    def change_to_local_time(dt_str):
-        # Parse to datetime
-        dt = datetime.strptime(dt_str, "%Y-%m-%d %H:%M:%S")
-
-        # Offset by -5 hours
-        offset_dt = dt + timedelta(hours=5, minutes = 15)
-
-        # Convert back to string
-        return offset_dt.strftime("%Y-%m-%d %H:%M:%S")
-    
     start_time = change_to_local_time(start_time)
     end_time = change_to_local_time(end_time)
 
-    # Connection string (update with your details)
-    conn_str = (
-        r'DRIVER={ODBC Driver 18 for SQL Server};'
-        r'SERVER=SERVER;'   # Data removed for confidentiality
-        r'DATABASE=DATABASE;'   # Data removed for confidentiality
-        r'UID=UID;' # Data removed for confidentiality
-        r'PWD=PWD;' # Data removed for confidentiality
-        r'Trusted_Connection=no;'  # Explicitly use SQL Authentication
-        r'Encrypt=yes;'  # Enable encryption for security
-        r'TrustServerCertificate=yes;'
-        r'Connection Timeout=30;'  # Increase timeout to 30 seconds
-    )
-
     try:
-        # Connect to the database
-        conn = pyodbc.connect(conn_str)
-        cursor = conn.cursor()
-
-        # Build SQL query
-        # Escape single quotes in source and measurements
-        source_escaped = source.replace("'", "''")
-        measurements_escaped = [m.replace("'", "''") for m in measurements]
-        measurements_str = ", ".join(f"'{m}'" for m in measurements_escaped)
-        
+        # Resolve names to IDs (cached per session)
+        ids = load_id_tables(pool)
+        source_ids = resolve_ids([source], ids['source_ids'], 'source')
+        quantity_ids = resolve_ids(measurements, ids['quantity_ids'], 'measurement')
+        if not source_ids or not quantity_ids:
+            return pd.DataFrame()
+
+        # Build SQL query, with bound parameters so the server can reuse the plan
         query = f"""
         SELECT 
             dl.TimestampUTC AS Time,
-            s.Name AS Device,
-            q.Name AS Measurement,
+            dl.SourceID,
+            dl.QuantityID,
             dl.Value
         FROM 
             DataLog2 dl
-        INNER JOIN 
-            Source s ON dl.SourceID = s.ID
-        INNER JOIN 
-            Quantity q ON dl.QuantityID = q.ID
         WHERE 
-            s.Name = '{source_escaped}'
-            AND q.Name IN ({measurements_str})
-            --AND dl.QuantityID IN (170)
-            AND dl.TimestampUTC BETWEEN '{start_time}' AND '{end_time}'
+            dl.SourceID IN ({placeholders(len(source_ids))})
+            AND dl.QuantityID IN ({placeholders(len(quantity_ids))})
+            AND dl.TimestampUTC BETWEEN ? AND ?
         ORDER BY 
             dl.TimestampUTC
         """
+        params = source_ids + quantity_ids + [datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S"),
+                                              datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")]
 
         # Execute query and load into DataFrame
-        df = pd.read_sql(query, conn)
-
-        # Close connection
-        cursor.close()
-        conn.close()
+        df = run_with_connection(lambda conn: pd.read_sql(query, conn, params=params), pool)
 
         if df.empty:
             return df
+
+        df = name_rows(df, ids)
         
         print(f'\ndf columns: {df.columns}\n')
 
@@ -90,7 +160,7 @@ def get_pme_report(source: str, measurements: list, start_time: str, end_time: s
         df['Time'] = pd.to_datetime(df['Time'])
 
         # Adjust for 5-hour offset (subtract 5 hours to match local time)
-        df['Time'] = df['Time'] - pd.Timedelta(hours=5)
+        df['Time'] = df['Time'] - LOCAL_OFFSET
 
         # Pivot the DataFrame: Time as index, Measurements as columns, Values as data
         df_pivoted = df.pivot(index='Time', columns='Measurement', values='Value').reset_index()
@@ -106,19 +176,288 @@ def get_pme_report(source: str, measurements: list, start_time: str, end_time: s
         print(f"Unexpected error: {e}")
         return pd.DataFrame()
 
+def time_windows(start_time: str, end_time: str, window_days: float) -> list:
+    """
+    Splits [start_time, end_time] into consecutive windows of window_days.
+
+    Returns:
+    - list of (window start, window end, is last window) with string timestamps;
+      every window is half-open except the last one, which includes end_time
+    """
+    start = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
+    end = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
+    step = timedelta(days=window_days)
+
+    windows = []
+    while True:
+        window_end = min(start + step, end)
+        last = window_end >= end
+        windows.append((start.strftime("%Y-%m-%d %H:%M:%S"), window_end.strftime("%Y-%m-%d %H:%M:%S"), last))
+        if last:
+            return windows
+        start = window_end
+
+def query_batches(source_ids: list, quantity_ids: list, start_time: str, end_time: str, window_days: float,
+                  order_by: str = "dl.TimestampUTC"):
+    """
+    Parameterized SQL for get_pme_reports / stream_pme_to_parquet: one query
+    per time window, and per group of sources when there are more IDs than
+    the server's parameter limit. The SQL text only depends on the number of
+    IDs, so the server reuses its plan across windows and calls.
+
+    Yields:
+    - (window start, window end, query, params)
+    """
+    per_query = max(1, MAX_QUERY_PARAMS - len(quantity_ids) - 2)
+    for window_start, window_end, last in time_windows(change_to_local_time(start_time),
+                                                       change_to_local_time(end_time), window_days):
+        end_operator = '<=' if last else '<'
+        window_params = [datetime.strptime(window_start, "%Y-%m-%d %H:%M:%S"),
+                         datetime.strptime(window_end, "%Y-%m-%d %H:%M:%S")]
+        for i in range(0, len(source_ids), per_query):
+            group = source_ids[i:i + per_query]
+            query = f"""
+            SELECT 
+                dl.TimestampUTC AS Time,
+                dl.SourceID,
+                dl.QuantityID,
+                dl.Value
+            FROM 
+                DataLog2 dl
+            WHERE 
+                dl.SourceID IN ({placeholders(len(group))})
+                AND dl.QuantityID IN ({placeholders(len(quantity_ids))})
+                AND dl.TimestampUTC >= ?
+                AND dl.TimestampUTC {end_operator} ?
+            ORDER BY 
+                {order_by}
+            """
+            yield window_start, window_end, query, group + quantity_ids + window_params
+
+def get_pme_reports(sources: list, measurements: list, start_time: str, end_time: str,
+                    pool: ConnectionPool = None, window_days: float = 7, raise_errors: bool = False) -> pd.DataFrame:
+    """
+    Fetch many sources and measurements at once, as a tidy long DataFrame.
+
+    Runs one set-based query per time window (all sources and measurements
+    together, filtered by ID with bound parameters) instead of one query per
+    source, so a substation or a monthly fleet export costs a handful of round
+    trips. Use pivot_by_source() to get the wide per-source tables returned by
+    get_pme_report.
+
+    Parameters:
+    - sources: list, device names (e.g., ['Meter1', 'Meter2'])
+    - measurements: list, measurement names (e.g., ['Vln A', 'Vln B'])
+    - start_time: str, start of reporting period (e.g., '2025-08-01 00:00:00')
+    - end_time: str, end of reporting period (e.g., '2025-08-31 23:59:00')
+    - pool: optional ConnectionPool; without it one connection is opened for all windows
+    - window_days: float, length of each query window in days
+    - raise_errors: bool, raise database errors instead of printing them and
+      returning an empty frame
+
+    Returns:
+    - pandas DataFrame with columns Time (local), Device, Measurement, Value,
+      sorted by Device and Time
+    """
+    columns = ['Time', 'Device', 'Measurement', 'Value']
+    if not sources or not measurements:
+        return pd.DataFrame(columns=columns)
+
+    own_pool = pool is None
+    if own_pool:
+        pool = ConnectionPool(CONN_STR, max_size=1)
+
+    frames = []
+    try:
+        ids = load_id_tables(pool)
+        source_ids = resolve_ids(sources, ids['source_ids'], 'source')
+        quantity_ids = resolve_ids(measurements, ids['quantity_ids'], 'measurement')
+        if not source_ids or not quantity_ids:
+            return pd.DataFrame(columns=columns)
+
+        for window_start, window_end, query, params in query_batches(source_ids, quantity_ids, start_time,
+                                                                     end_time, window_days):
+            frame = pool.run(lambda conn: pd.read_sql(query, conn, params=params))
+            print(f"[PME] {window_start} -> {window_end}: {len(frame)} rows")
+            if not frame.empty:
+                frames.append(frame)
+
+    except pyodbc.Error as e:
+        if raise_errors:
+            raise
+        print(f"Database error: {e}")
+        return pd.DataFrame(columns=columns)
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"Unexpected error: {e}")
+        return pd.DataFrame(columns=columns)
+    finally:
+        if own_pool:
+            pool.close()
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+
+    df = name_rows(pd.concat(frames, ignore_index=True), ids)
+    df['Time'] = pd.to_datetime(df['Time']) - LOCAL_OFFSET
+    df = df.sort_values(['Device', 'Time'], kind='stable', ignore_index=True)
+    return df[columns]
+
+def pivot_by_source(long_df: pd.DataFrame, sources: list = None) -> dict:
+    """
+    Wide per-source tables from a get_pme_reports() frame, built on demand.
+
+    Parameters:
+    - long_df: DataFrame with Time, Device, Measurement, Value columns
+    - sources: optional list of devices to pivot (default: every device in long_df)
+
+    Returns:
+    - dict {source: DataFrame}, each shaped like get_pme_report's result
+      (Time column plus one column per measurement, last timestamp dropped)
+    """
+    if sources is None:
+        sources = long_df['Device'].unique().tolist()
+
+    grouped = long_df.groupby('Device', sort=False)
+    pivots = {}
+    for source in sources:
+        if source not in grouped.groups:
+            pivots[source] = pd.DataFrame()
+            continue
+        df = grouped.get_group(source)
+        df_pivoted = df.pivot(index='Time', columns='Measurement', values='Value').reset_index()
+        pivots[source] = df_pivoted[:-1]
+    return pivots
+
+def stream_pme_to_parquet(sources: list, measurements: list, start_time: str, end_time: str, output_dir: str,
+                          pool: ConnectionPool = None, chunk_size: int = 50_000, window_days: float = 7,
+                          overwrite: bool = False) -> int:
+    """
+    Stream PME rows straight to a Parquet dataset partitioned by source and day.
+
+    Rows are fetched with cursor.fetchmany(chunk_size) and every chunk is
+    written before the next one is read, so peak memory depends on chunk_size,
+    not on the date range. Output layout (Hive style, read it back with
+    read_pme_parquet or pd.read_parquet):
+
+        output_dir/Device=<source>/Day=<YYYY-MM-DD>/part-<n>-0.parquet
+
+    Each file has Time (local), Measurement and Value columns. Day is the
+    local date. Rows are not pivoted.
+
+    Parameters:
+    - sources, measurements, start_time, end_time, pool, window_days: as in get_pme_reports
+    - output_dir: str, dataset folder
+    - chunk_size: int, rows per fetch and per write
+    - overwrite: bool, delete an existing non-empty output_dir first
+      (otherwise a FileExistsError is raised, so two runs never mix)
+
+    Returns:
+    - int, number of rows written
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if os.path.isdir(output_dir) and os.listdir(output_dir):
+        if not overwrite:
+            raise FileExistsError(f"'{output_dir}' is not empty. Use another folder or overwrite=True.")
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    if not sources or not measurements:
+        return 0
+
+    own_pool = pool is None
+    if own_pool:
+        pool = ConnectionPool(CONN_STR, max_size=1)
+
+    n_rows = 0
+    n_chunks = 0
+    try:
+        ids = load_id_tables(pool)
+        source_ids = resolve_ids(sources, ids['source_ids'], 'source')
+        quantity_ids = resolve_ids(measurements, ids['quantity_ids'], 'measurement')
+        if not source_ids or not quantity_ids:
+            return 0
+
+        # Ordered by source, so a chunk touches few partitions (few small files)
+        for window_start, window_end, query, params in query_batches(source_ids, quantity_ids, start_time, end_time,
+                                                                     window_days, order_by="dl.SourceID, dl.TimestampUTC"):
+            # No automatic retry here: a retried window would write its first chunks twice
+            with pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                columns = [column[0] for column in cursor.description]
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+
+                    df = name_rows(pd.DataFrame.from_records(rows, columns=columns), ids)
+                    df['Time'] = pd.to_datetime(df['Time']) - LOCAL_OFFSET
+                    df['Value'] = df['Value'].astype('float64')
+                    df['Day'] = df['Time'].dt.strftime('%Y-%m-%d')
+
+                    table = pa.Table.from_pandas(df[['Device', 'Day', 'Time', 'Measurement', 'Value']],
+                                                 preserve_index=False)
+                    pq.write_to_dataset(table, output_dir, partition_cols=['Device', 'Day'],
+                                        basename_template=f"part-{n_chunks}-{{i}}.parquet",
+                                        existing_data_behavior='overwrite_or_ignore')
+                    n_rows += len(df)
+                    n_chunks += 1
+                    del rows, df, table
+                cursor.close()
+            print(f"[PME] {window_start} -> {window_end}: {n_rows} rows written so far")
+
+    finally:
+        if own_pool:
+            pool.close()
+
+    print(f"[PME] {n_rows} rows in {n_chunks} chunk(s) written to '{output_dir}'")
+    return n_rows
+
+def read_pme_parquet(output_dir: str, sources: list = None, days: list = None,
+                     measurements: list = None) -> pd.DataFrame:
+    """
+    Read back a stream_pme_to_parquet dataset, opening only the partitions
+    needed for the given sources and days ('YYYY-MM-DD').
+
+    Returns:
+    - pandas DataFrame with Time, Device, Measurement, Value columns
+    """
+    filters = []
+    if sources is not None:
+        filters.append(('Device', 'in', list(sources)))
+    if days is not None:
+        filters.append(('Day', 'in', list(days)))
+    if measurements is not None:
+        filters.append(('Measurement', 'in', list(measurements)))
+
+    df = pd.read_parquet(output_dir, filters=filters or None)
+    columns = ['Time', 'Device', 'Measurement', 'Value']
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    df['Device'] = df['Device'].astype(str)
+    return df.sort_values(['Device', 'Time'], kind='stable', ignore_index=True)[columns]
+
+
 
+if __name__ == "__main__":
+    # Example usage
+    source = "source"   # Data removed for confidentiality
+    measurements = ['measurement']  # Data removed for confidentiality
 
-# Example usage
-source = "source"   # Data removed for confidentiality
-measurements = ['measurement']  # Data removed for confidentiality
+    start_time = "2024-10-01 00:00:00"  # Format: YYYY-MM-DD HH:MM:SS
+    end_time = "2024-11-01 00:00:00"
 
-start_time = "2024-10-01 00:00:00"  # Format: YYYY-MM-DD HH:MM:SS
-end_time = "2024-11-01 00:00:00"
+    # Reuse warm connections across calls (one pool per session)
+    with ConnectionPool(CONN_STR, max_size=2) as pool:
+        df = get_pme_report(source, measurements, start_time, end_time, pool=pool)
 
-df = get_pme_report(source, measurements, start_time, end_time)
-if not df.empty:
-    print(f'Source: {source}\nMeasurements: {measurements}\n')
-    print(df.head(10), '\n')
-    print(df.tail(10))
-else:
-    print(f"\nNo data returned or an error occurred for\nSource: {source}\nMeasurements: {measurements}\n")
\ No newline at end of file
+    if not df.empty:
+        print(f'Source: {source}\nMeasurements: {measurements}\n')
+        print(df.head(10), '\n')
+        print(df.tail(10))
+    else:
+        print(f"\nNo data returned or an error occurred for\nSource: {source}\nMeasurements: {measurements}\n")
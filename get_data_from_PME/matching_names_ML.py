@@ -1,7 +1,338 @@
 from fuzzywuzzy import fuzz
+from collections import Counter, defaultdict
+from operator import itemgetter
+import heapq
+import json
 import os
 
-def fuzzy_match_files(file1_path: str, file2_path: str, output_path: str, threshold: int = 80):
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+from similarity_engine import iter_top_k, score_block
+
+MATCH_MEMO_VERSION = 2
+# Characters of each file2 line that are a prefix code, not part of the name
+PREFIX_LEN = 2
+
+def char_ngrams(text: str, n: int = 3) -> set:
+    """
+    Returns the set of lowercase character n-grams of text, padded with one space
+    on each side so short strings and word edges still produce n-grams.
+    """
+    padded = f" {text.lower()} "
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+def build_ngram_index(strings: list, n: int = 3) -> dict:
+    """
+    Builds an inverted index: n-gram -> list of positions in strings that contain it.
+    """
+    index = defaultdict(list)
+    for pos, text in enumerate(strings):
+        for gram in char_ngrams(text, n):
+            index[gram].append(pos)
+    return index
+
+def vectorized_greedy_matches(lines1: list, lines2: list, trimmed2: list, threshold: int,
+                              top_k: int, workers: int | None, chunk_size: int) -> list:
+    """
+    Same greedy, input-order assignment as the all-pairs loop, but scores come in
+    blocks from similarity_engine (C scorer, process pool). Each line of file 1
+    looks at its top_k candidates with score >= threshold; when none of them is
+    still free, or the chosen one could tie with a candidate outside the list,
+    the full row is scored again so the result equals the all-pairs loop.
+    """
+    # Positions of each distinct file2 string: taking one string takes all its duplicates
+    positions_of = defaultdict(list)
+    for pos, s2 in enumerate(lines2):
+        positions_of[s2].append(pos)
+    taken = np.zeros(len(lines2), dtype=bool)
+
+    matches = []
+    candidates = iter_top_k(lines1, trimmed2, top_k=top_k, score_cutoff=threshold,
+                            workers=workers, chunk_size=chunk_size)
+    for s1, (cols, scores) in zip(lines1, candidates):
+        best_match, best_score = None, 0
+        free = ~taken[cols]
+        if free.any():
+            first = int(np.argmax(free))
+            full_list = len(cols) == top_k
+            if not (full_list and scores[first] == scores[-1]):
+                best_match, best_score = lines2[cols[first]], int(scores[first])
+
+        if best_match is None:
+            row = score_block([s1], trimmed2)[0].astype(np.int16)
+            row[taken] = -1
+            pos = int(np.argmax(row))
+            if row[pos] > 0:
+                best_match, best_score = lines2[pos], int(row[pos])
+
+        if best_match is not None:
+            taken[positions_of[best_match]] = True
+        matches.append((s1, best_match, best_score))
+    return matches
+
+def optimal_matches(lines1: list, lines2: list, trimmed2: list, threshold: int,
+                    top_k: int, workers: int | None, chunk_size: int) -> list:
+    """
+    Globally optimal one-to-one assignment instead of the greedy input-order one.
+
+    1. Builds a sparse candidate graph: for each line of file 1, its top_k
+       file2 strings with score >= threshold (similarity_engine, process pool).
+    2. Solves a maximum-weight bipartite matching on that graph. Every line of
+       file 1 also gets a private "unmatched" node, so a full matching always
+       exists and leaving a line unmatched costs as much as a score of 0.
+       The cost only depends on the number of candidate edges, not on n·m.
+    3. Lines left unmatched get the best still-free file2 string, greedily in
+       input order (as in the all-pairs loop), so every line keeps a partner.
+
+    Duplicate lines in file 2 are treated as one string, as in the greedy loop.
+    """
+    # Columns are distinct file2 strings, kept in file order
+    first_pos = {}
+    for pos, s2 in enumerate(lines2):
+        first_pos.setdefault(s2, pos)
+    unique2 = list(first_pos)
+    unique_trimmed = [trimmed2[first_pos[s2]] for s2 in unique2]
+
+    rows, cols, costs = [], [], []
+    for i, (cand_cols, scores) in enumerate(iter_top_k(lines1, unique_trimmed, top_k=top_k, score_cutoff=threshold,
+                                                       workers=workers, chunk_size=chunk_size)):
+        rows.extend([i] * len(cand_cols))
+        cols.extend(cand_cols.tolist())
+        # Explicit zeros mean "no edge" for scipy, so costs stay >= 1: cost = 101 - score
+        costs.extend((101 - scores.astype(np.int16)).tolist())
+
+    n, m = len(lines1), len(unique2)
+    # Private "unmatched" column for every row, at the cost of a score of 0
+    rows.extend(range(n))
+    cols.extend(range(m, m + n))
+    costs.extend([101] * n)
+    graph = csr_matrix((costs, (rows, cols)), shape=(n, m + n))
+    print(f"Candidate graph: {len(rows) - n} edges for {n} x {m} names")
+
+    row_ind, col_ind = min_weight_full_bipartite_matching(graph)
+
+    taken = np.zeros(m, dtype=bool)
+    results = [None] * n
+    for i, j in zip(row_ind, col_ind):
+        if j < m:
+            taken[j] = True
+            results[i] = (lines1[i], unique2[j], 101 - int(graph[i, j]))
+
+    # Greedy fill for lines without a candidate above the threshold
+    for i in range(n):
+        if results[i] is None:
+            row = score_block([lines1[i]], unique_trimmed)[0].astype(np.int16)
+            row[taken] = -1
+            j = int(np.argmax(row))
+            if row[j] > 0:
+                taken[j] = True
+                results[i] = (lines1[i], unique2[j], int(row[j]))
+            else:
+                results[i] = (lines1[i], None, 0)
+    return results
+
+def greedy_matches(lines1: list, lines2: list, trimmed2: list, method: str,
+                   top_k: int, ngram_size: int) -> list:
+    """
+    Greedy, input-order assignment of the "all-pairs" and "ngram" methods: each
+    line of file 1 takes the best-scoring file2 string not taken yet.
+    """
+    matches = []
+
+    s2_already_found = set()
+
+    if method == "ngram":
+        index2 = build_ngram_index(trimmed2, ngram_size)
+
+    # Compare each string from file1 with each (or each candidate) from file2
+    for s1 in lines1:
+        best_score = 0
+        best_match = None
+
+        if method == "ngram":
+            shared = Counter()
+            for gram in char_ngrams(s1, ngram_size):
+                shared.update(index2.get(gram, ()))
+            # Partial selection (heap of top_k) instead of sorting every row sharing an n-gram;
+            # ties keep index order, as with most_common()
+            free_counts = (item for item in shared.items() if lines2[item[0]] not in s2_already_found)
+            candidates = [pos for pos, _ in heapq.nlargest(top_k, free_counts, key=itemgetter(1))]
+            if not candidates:
+                candidates = range(len(lines2))
+        else:
+            candidates = range(len(lines2))
+
+        for pos in candidates:
+            s2 = lines2[pos]
+            if s2 not in s2_already_found:
+                score = fuzz.ratio(s1, trimmed2[pos])  #.token_sort_ratio(s1, s2[2:])  # Can use fuzz.token_sort_ratio() for better results
+                if score > best_score:
+                    best_score = score
+                    best_match = s2
+
+        s2_already_found.add(best_match)
+
+        # if best_score >= threshold:
+        #     matches.append((s1, best_match, best_score))
+        matches.append((s1, best_match, best_score))
+    return matches
+
+def match_lines(lines1: list, lines2: list, trimmed2: list, threshold: int, method: str,
+                top_k: int, ngram_size: int, workers: int | None, chunk_size: int) -> list:
+    """
+    Runs the matcher selected by `method` and returns (s1, s2 | None, score) in file 1 order.
+    """
+    if not lines1 or not lines2:
+        return [(s1, None, 0) for s1 in lines1]
+    if method == "vectorized":
+        return vectorized_greedy_matches(lines1, lines2, trimmed2, threshold, top_k, workers, chunk_size)
+    if method == "optimal":
+        return optimal_matches(lines1, lines2, trimmed2, threshold, top_k, workers, chunk_size)
+    return greedy_matches(lines1, lines2, trimmed2, method, top_k, ngram_size)
+
+def match_settings(method: str, threshold: int, top_k: int, ngram_size: int) -> dict:
+    """
+    Settings that decide which match a line gets; a memo is only reused with the same ones.
+    """
+    return {"method": method, "threshold": threshold, "top_k": top_k, "ngram_size": ngram_size}
+
+def load_match_memo(memo_path: str, settings: dict) -> dict:
+    """
+    Loads the match memo written by save_match_memo.
+
+    The memo holds the normalized (prefix-trimmed) file2 names seen on the last
+    run, the matches chosen for every file1 line (one per occurrence, in file
+    order, so repeated lines keep their own partners) and the matching settings
+    (method, threshold, top_k, ngram_size) it was built with. A missing or
+    unreadable memo, or one built with other settings, gives an empty one, so
+    the next run scores every line.
+    """
+    empty = {"names2": {}, "matches": {}}
+    if not os.path.exists(memo_path):
+        print(f"[MEMO] No memo at {memo_path}. Scoring every line.")
+        return empty
+    try:
+        with open(memo_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Could not read memo {memo_path} ({e}). Scoring every line.")
+        return empty
+    if data.get("version") != MATCH_MEMO_VERSION or data.get("prefix_len") != PREFIX_LEN:
+        print(f"[MEMO] Memo {memo_path} was built with other settings. Scoring every line.")
+        return empty
+    if data.get("settings") != settings:
+        print(f"[MEMO] Memo {memo_path} was built with {data.get('settings')}, this run uses {settings}. "
+              f"Scoring every line.")
+        return empty
+    print(f"[MEMO] Loaded {sum(map(len, data['matches'].values()))} match(es) from {memo_path}")
+    return data
+
+def save_match_memo(memo_path: str, lines2: list, trimmed2: list, matches: list, settings: dict):
+    """
+    Writes the match memo as JSON next to its final location, then swaps it in,
+    so an interrupted run never leaves a half-written memo behind.
+    """
+    # Repeated file1 lines keep one [s2, score] per occurrence, in file order
+    memo_matches = defaultdict(list)
+    for s1, s2, score in matches:
+        memo_matches[s1].append([s2, score])
+    data = {
+        "version": MATCH_MEMO_VERSION,
+        "prefix_len": PREFIX_LEN,
+        "settings": settings,
+        "names2": dict(zip(lines2, trimmed2)),
+        "matches": memo_matches,
+    }
+    folder = os.path.dirname(memo_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp = memo_path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, memo_path)
+
+def incremental_matches(lines1: list, lines2: list, trimmed2: list, memo: dict, threshold: int,
+                        method: str, top_k: int, ngram_size: int, workers: int | None, chunk_size: int) -> list:
+    """
+    Reuses the memo and only scores what changed since the last run:
+
+    Every occurrence of a repeated file1 line is its own row: the n-th copy of
+    a line reuses the n-th match stored for it, and pending copies are matched
+    separately, so matching stays one-to-one.
+
+    1. A file1 line already in the memo keeps its match when that file2 name
+       still exists (confirmed match). Lines whose partner was removed, and
+       added or edited lines (an edited line is a new string), are pending.
+    2. Kept matches below `threshold` are tried against the added file2 names
+       only, and move to one of them if it scores higher.
+    3. Pending lines are matched with `method` against the file2 names that
+       are still free.
+
+    The work grows with the number of added / changed lines, not with the size
+    of the files. Matches found on earlier runs are not revisited, except as
+    described in step 2.
+    """
+    prev_names2 = memo["names2"]
+    prev_matches = memo["matches"]
+    current2 = set(lines2)
+    added = [pos for pos, s2 in enumerate(lines2) if s2 not in prev_names2]
+
+    # Rows are (line, occurrence), so repeated lines are matched one by one
+    seen = Counter()
+    keys = []
+    for s1 in lines1:
+        keys.append((s1, seen[s1]))
+        seen[s1] += 1
+
+    results = {}
+    taken = set()
+    for key in keys:
+        s1, occurrence = key
+        previous = prev_matches.get(s1, [])
+        if occurrence >= len(previous):
+            continue
+        s2, score = previous[occurrence]
+        if s2 is None or (s2 in current2 and s2 not in taken):
+            results[key] = (s1, s2, score)
+            taken.add(s2)
+    reused = len(results)
+
+    upgraded = 0
+    if added:
+        added2 = [lines2[pos] for pos in added]
+        added_trimmed = [trimmed2[pos] for pos in added]
+        free_added = np.ones(len(added), dtype=bool)
+        for key in keys:
+            if key not in results or results[key][2] >= threshold:
+                continue
+            s1 = key[0]
+            row = score_block([s1], added_trimmed)[0].astype(np.int16)
+            row[~free_added] = -1
+            pos = int(np.argmax(row))
+            if row[pos] > results[key][2]:
+                taken.discard(results[key][1])
+                results[key] = (s1, added2[pos], int(row[pos]))
+                taken.add(added2[pos])
+                # Every duplicate of the new partner is taken too
+                free_added &= np.array([s2 != added2[pos] for s2 in added2])
+                upgraded += 1
+
+    pending = [key for key in keys if key not in results]
+    free = [pos for pos, s2 in enumerate(lines2) if s2 not in taken]
+    print(f"[MEMO] Reused {reused} match(es), upgraded {upgraded}, scoring {len(pending)} new/changed line(s) "
+          f"against {len(free)} free name(s) ({len(added)} added to file 2)")
+    pending_matches = match_lines([s1 for s1, _ in pending], [lines2[pos] for pos in free],
+                                  [trimmed2[pos] for pos in free], threshold, method, top_k, ngram_size,
+                                  workers, chunk_size)
+    results.update(zip(pending, pending_matches))
+
+    return [results[key] for key in keys]
+
+def fuzzy_match_files(file1_path: str, file2_path: str, output_path: str, threshold: int = 80,
+                      method: str = "all-pairs", top_k: int = 50, ngram_size: int = 3,
+                      workers: int | None = None, chunk_size: int = 512, memo_path: str | None = None):
     """
     Matches strings from two text files using fuzzy string matching.
     Saves pairs with similarity >= threshold to output file.
@@ -11,7 +342,28 @@ def fuzzy_match_files(file1_path: str, file2_path: str, output_path: str, thresh
     - file2_path: Path to second text file (one string per line)
     - output_path: Path for output file with matched pairs
     - threshold: Minimum similarity score (0-100) to consider a match
+    - method: "all-pairs" scores every line of file 2 for each line of file 1.
+      "ngram" builds a character n-gram inverted index over file 2 and only scores
+      the top_k candidates sharing the most n-grams with the line of file 1
+      (falls back to all lines when none share an n-gram).
+    - top_k: Candidates scored per line with method="ngram". Higher = better recall, slower.
+    - ngram_size: n-gram length used by method="ngram".
+    - method="vectorized" scores blocks of pairs with rapidfuzz's C scorer on a
+      process pool and keeps the top_k candidates >= threshold per line; results
+      equal the "all-pairs" ones (see vectorized_greedy_matches).
+    - method="optimal" replaces the greedy assignment with a maximum-weight
+      one-to-one matching over the candidate pairs >= threshold (see
+      optimal_matches), so a later, better match can claim a file2 name.
+    - workers: Processes used by method="vectorized"/"optimal" (default: all cores).
+    - chunk_size: Lines of file 1 scored per task by method="vectorized"/"optimal".
+    - memo_path: Optional JSON match memo. When given, matches of unchanged lines
+      are reused from the previous run and only added or changed lines are
+      scored (see incremental_matches); the memo is updated afterwards. A memo
+      built with another method, threshold, top_k or ngram_size is not reused.
     """
+    if method not in ("all-pairs", "ngram", "vectorized", "optimal"):
+        raise ValueError(f"Unknown method '{method}'. Use 'all-pairs', 'ngram', 'vectorized' or 'optimal'.")
+
     # Read and clean strings from both files
     def read_lines(filepath):
         if not os.path.exists(filepath):
@@ -27,28 +379,18 @@ def fuzzy_match_files(file1_path: str, file2_path: str, output_path: str, thresh
         print("One or both files are empty or not found.")
         return
     
-    matches = []
+    # The first PREFIX_LEN characters of each file2 line are a prefix code, not part of the name
+    trimmed2 = [s2[PREFIX_LEN:] for s2 in lines2]
 
-    s2_already_found = []
-    
-    # Compare each string from file1 with each from file2
-    for s1 in lines1:
-        best_score = 0
-        best_match = None
-        
-        for s2 in lines2:
-            if s2 not in s2_already_found:
-                score = fuzz.ratio(s1, s2[2:])  #.token_sort_ratio(s1, s2[2:])  # Can use fuzz.token_sort_ratio() for better results
-                if score > best_score:
-                    best_score = score
-                    best_match = s2
-        
-        s2_already_found.append(best_match)
+    if memo_path:
+        settings = match_settings(method, threshold, top_k, ngram_size)
+        memo = load_match_memo(memo_path, settings)
+        matches = incremental_matches(lines1, lines2, trimmed2, memo, threshold, method,
+                                      top_k, ngram_size, workers, chunk_size)
+        save_match_memo(memo_path, lines2, trimmed2, matches, settings)
+    else:
+        matches = match_lines(lines1, lines2, trimmed2, threshold, method, top_k, ngram_size, workers, chunk_size)
 
-        # if best_score >= threshold:
-        #     matches.append((s1, best_match, best_score))
-        matches.append((s1, best_match, best_score))
-    
     # Sort by similarity score (descending)
     matches.sort(key=lambda x: x[2], reverse=True)
     
@@ -67,5 +409,8 @@ if __name__ == "__main__":
         file1_path=r"Homologating_names\input\txt\pme_names.txt",
         file2_path=r"Homologating_names\input\txt\zmeasure_names.txt",
         output_path=r"Homologating_names\output\related_v31.txt",
-        threshold=50
+        threshold=50,
+        method="ngram",
+        top_k=50,
+        memo_path=r"Homologating_names\output\match_memo.json"
     )
\ No newline at end of file
@@ -0,0 +1,212 @@
+"""
+Local time-series cache for PME extractions
+===========================================
+
+Keeps the rows already read from PME on disk, one Parquet file per
+(source, measurement), together with the time intervals each file holds.
+A request only queries the gaps that are not cached yet, and merges them
+with the cached rows:
+
+    long_df = cached_pme_reports(sources, measurements, "2024-10-01 00:00:00",
+                                 "2024-11-01 00:00:00", cache_dir="cache", pool=pool)
+
+Requesting the last week again afterwards is then answered from disk without
+touching SQL Server. The result has the same columns as get_pme_reports
+(Time, Device, Measurement, Value).
+
+Layout of cache_dir:
+- index.json: {"version", "series": {id: {"source", "measurement", "intervals"}}}
+  where intervals are [start, end] pairs (both included) in the same
+  'YYYY-MM-DD HH:MM:SS' format and time reference as the requests
+- data/<id>.parquet: Time and Value columns of that series
+
+Intervals closer than `settle_minutes` to the present are not recorded as
+held, because PME may still be logging them; they are queried again next time.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from ConnectionAttemptExtractingData import QUERY_OFFSET, LOCAL_OFFSET, get_pme_reports, load_id_tables
+from pme_pool import ConnectionPool
+
+CACHE_VERSION = 1
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Row Time (local) = requested time + TIME_SHIFT
+TIME_SHIFT = pd.Timedelta(QUERY_OFFSET) - LOCAL_OFFSET
+
+
+def series_id(source: str, measurement: str) -> str:
+    return hashlib.sha1(f"{source}\x1f{measurement}".encode('utf-8')).hexdigest()[:16]
+
+def load_cache_index(cache_dir: str) -> dict:
+    """
+    Reads cache_dir/index.json. A missing or outdated index gives an empty cache.
+    """
+    path = os.path.join(cache_dir, 'index.json')
+    if not os.path.exists(path):
+        return {'version': CACHE_VERSION, 'series': {}}
+    with open(path, 'r', encoding='utf-8') as file:
+        index = json.load(file)
+    if index.get('version') != CACHE_VERSION:
+        print(f"[WARN] Cache index '{path}' has another version, starting an empty cache")
+        return {'version': CACHE_VERSION, 'series': {}}
+    return index
+
+def write_atomic(path: str, write) -> None:
+    # Write to a temporary file first so an interrupted run never leaves a broken file
+    tmp_path = path + '.tmp'
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def save_cache_index(cache_dir: str, index: dict) -> None:
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(index, file, ensure_ascii=False, indent=1)
+    write_atomic(os.path.join(cache_dir, 'index.json'), write)
+
+def merge_intervals(intervals: list) -> list:
+    """
+    Union of [start, end] datetime intervals, sorted, with overlapping or
+    touching intervals joined.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+def missing_intervals(held: list, start: datetime, end: datetime) -> list:
+    """
+    Parts of [start, end] not covered by the merged intervals in held.
+
+    Returns:
+    - list of (gap start, gap end); a gap shares its edges with the held
+      intervals around it, so edge rows are read again and de-duplicated
+    """
+    gaps = []
+    cursor = start
+    for held_start, held_end in held:
+        if held_end < cursor:
+            continue
+        if held_start > end:
+            break
+        if held_start > cursor:
+            gaps.append((cursor, held_start))
+        cursor = max(cursor, held_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+def read_series(cache_dir: str, sid: str) -> pd.DataFrame:
+    path = os.path.join(cache_dir, 'data', f'{sid}.parquet')
+    if not os.path.exists(path):
+        return pd.DataFrame({'Time': pd.Series(dtype='datetime64[ns]'), 'Value': pd.Series(dtype='float64')})
+    return pd.read_parquet(path)
+
+def write_series(cache_dir: str, sid: str, df: pd.DataFrame) -> None:
+    write_atomic(os.path.join(cache_dir, 'data', f'{sid}.parquet'),
+                 lambda tmp_path: df.to_parquet(tmp_path, index=False))
+
+def cached_pme_reports(sources: list, measurements: list, start_time: str, end_time: str, cache_dir: str,
+                       pool: ConnectionPool = None, window_days: float = 7, settle_minutes: float = 60) -> pd.DataFrame:
+    """
+    get_pme_reports through the local cache: only the intervals not cached yet
+    for each (source, measurement) are queried.
+
+    Sources that miss the same interval for the same measurements are fetched
+    together with one get_pme_reports call, so every call asks for exactly
+    the (source, measurement) pairs it needs and nothing cached is downloaded
+    again. Each fetched gap is written to disk (data first, then index)
+    before the next one, so a failed query never marks an interval as held.
+    Sources or measurements PME does not know are never marked as held either,
+    so they are queried again once they exist (see load_id_tables(refresh=True)).
+
+    Parameters:
+    - sources, measurements, start_time, end_time, pool, window_days: as in get_pme_reports
+    - cache_dir: str, cache folder (created if needed)
+    - settle_minutes: float, recent minutes that are returned but not recorded as held
+
+    Returns:
+    - pandas DataFrame with columns Time (local), Device, Measurement, Value,
+      sorted by Device, Time and Measurement
+    """
+    columns = ['Time', 'Device', 'Measurement', 'Value']
+    os.makedirs(os.path.join(cache_dir, 'data'), exist_ok=True)
+    index = load_cache_index(cache_dir)
+
+    start = datetime.strptime(start_time, TIME_FORMAT)
+    end = datetime.strptime(end_time, TIME_FORMAT)
+    settled_until = datetime.now(timezone.utc).replace(tzinfo=None) - QUERY_OFFSET - timedelta(minutes=settle_minutes)
+
+    # Missing measurements of every source, per gap
+    keys = [(source, measurement) for source in dict.fromkeys(sources) for measurement in dict.fromkeys(measurements)]
+    gap_measurements_of = {}
+    for source, measurement in keys:
+        entry = index['series'].setdefault(series_id(source, measurement),
+                                           {'source': source, 'measurement': measurement, 'intervals': []})
+        held = [[datetime.strptime(a, TIME_FORMAT), datetime.strptime(b, TIME_FORMAT)] for a, b in entry['intervals']]
+        for gap in missing_intervals(held, start, end):
+            gap_measurements_of.setdefault(gap, {}).setdefault(source, []).append(measurement)
+
+    # One query per (gap, set of measurements): its sources x measurements are all missing
+    queries = {}
+    for gap, measurements_of in gap_measurements_of.items():
+        for source, gap_measurements in measurements_of.items():
+            queries.setdefault((gap, tuple(gap_measurements)), []).append(source)
+
+    print(f"[CACHE] {len(keys)} series requested, {len(gap_measurements_of)} missing interval(s), "
+          f"{len(queries)} query(ies)")
+
+    # PME names, to leave unknown sources / measurements out of the index
+    ids = load_id_tables(pool) if queries else None
+
+    for ((gap_start, gap_end), gap_measurements), gap_sources in queries.items():
+        gap_keys = [(source, measurement) for source in gap_sources for measurement in gap_measurements]
+        fetched = get_pme_reports(gap_sources, list(gap_measurements), gap_start.strftime(TIME_FORMAT),
+                                  gap_end.strftime(TIME_FORMAT), pool=pool, window_days=window_days,
+                                  raise_errors=True)
+        fetched_groups = fetched.groupby(['Device', 'Measurement'], sort=False)
+
+        for source, measurement in gap_keys:
+            sid = series_id(source, measurement)
+            if (source, measurement) in fetched_groups.groups:
+                new_rows = fetched_groups.get_group((source, measurement))[['Time', 'Value']]
+                series = pd.concat([read_series(cache_dir, sid), new_rows], ignore_index=True)
+                series = series.drop_duplicates('Time', keep='last').sort_values('Time', ignore_index=True)
+                write_series(cache_dir, sid, series)
+
+            if source not in ids['source_ids'] or measurement not in ids['quantity_ids']:
+                continue
+            held_end = min(gap_end, settled_until)
+            if held_end >= gap_start:
+                entry = index['series'][sid]
+                intervals = [[datetime.strptime(a, TIME_FORMAT), datetime.strptime(b, TIME_FORMAT)] for a, b in entry['intervals']]
+                intervals = merge_intervals(intervals + [[gap_start, held_end]])
+                entry['intervals'] = [[a.strftime(TIME_FORMAT), b.strftime(TIME_FORMAT)] for a, b in intervals]
+
+        save_cache_index(cache_dir, index)
+
+    # Serve every series from disk
+    first_time, last_time = start + TIME_SHIFT, end + TIME_SHIFT
+    frames = []
+    for source, measurement in keys:
+        series = read_series(cache_dir, series_id(source, measurement))
+        series = series[(series['Time'] >= first_time) & (series['Time'] <= last_time)]
+        if series.empty:
+            continue
+        frames.append(series.assign(Device=source, Measurement=measurement))
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(frames, ignore_index=True)
+    return df.sort_values(['Device', 'Time', 'Measurement'], kind='stable', ignore_index=True)[columns]
@@ -0,0 +1,203 @@
+"""
+Pool of warm, reusable PME (SQL Server) connections
+===================================================
+
+Opening an encrypted `pyodbc` connection (TLS handshake + login) can take
+longer than the query itself. `ConnectionPool` keeps up to `max_size`
+connections open between calls, so a batch of hundreds of meters pays the
+connection cost only a few times:
+
+    with ConnectionPool(CONN_STR, max_size=4) as pool:
+        for source in sources:
+            df = get_pme_report(source, measurements, start_time, end_time, pool=pool)
+
+- A connection that sat idle for more than `max_idle_s` seconds is checked
+  with `health_check_query` before it is handed out; if the check fails it
+  is closed and replaced by a new one.
+- `pool.run(work)` calls `work(conn)`; if it fails with a connection error
+  (`OperationalError`, `InterfaceError` or SQLSTATE 08xxx) the connection is
+  discarded and `work` is retried once on a fresh connection, so a
+  connection dropped by the server is reconnected transparently. Other
+  errors (bad SQL, bad parameters) are raised at once and the connection
+  is kept.
+- The pool is thread-safe: at most `max_size` connections exist at once and
+  further callers wait for one to be released.
+"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import pyodbc
+except ImportError:  # only needed when no `connect` function is given
+    pyodbc = None
+
+
+class ConnectionPool:
+    """
+    Bounded pool of warm database connections (see module docstring).
+
+    Parameters:
+    - conn_str: ODBC connection string
+    - max_size: maximum number of connections open at the same time
+    - max_idle_s: idle time after which a connection is health-checked before reuse
+    - health_check_query: cheap query used for the health check
+    - connect: function conn_str -> connection (default: pyodbc.connect)
+    - retry_errors: exceptions that trigger a reconnect and retry in run()
+      (default: pyodbc.OperationalError and pyodbc.InterfaceError; any
+      pyodbc.Error with a 08xxx SQLSTATE counts too)
+    - acquire_timeout: seconds to wait for a free connection (None = forever)
+    """
+
+    def __init__(self, conn_str: str, max_size: int = 4, max_idle_s: float = 300.0,
+                 health_check_query: str = "SELECT 1", connect: Optional[Callable[[str], Any]] = None,
+                 retry_errors: Optional[Tuple[type, ...]] = None, acquire_timeout: Optional[float] = 60.0):
+        if connect is None:
+            if pyodbc is None:
+                raise RuntimeError("ConnectionPool needs the 'pyodbc' package (pip install pyodbc) or a connect function.")
+            connect = pyodbc.connect
+        if retry_errors is None:
+            retry_errors = (pyodbc.OperationalError, pyodbc.InterfaceError) if pyodbc is not None else (Exception,)
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1.")
+
+        self.conn_str = conn_str
+        self.max_size = max_size
+        self.max_idle_s = max_idle_s
+        self.health_check_query = health_check_query
+        self.connect = connect
+        self.retry_errors = retry_errors
+        self.acquire_timeout = acquire_timeout
+
+        self._idle: "queue.LifoQueue[Tuple[Any, float]]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats: Dict[str, int] = {"connects": 0, "reuses": 0, "health_failures": 0, "retries": 0}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def _healthy(self, conn: Any) -> bool:
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.health_check_query)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _is_connection_error(self, exc: BaseException) -> bool:
+        """
+        True when exc means the connection itself is unusable: one of
+        retry_errors, or a pyodbc error whose SQLSTATE is in class 08
+        (connection exception).
+        """
+        if isinstance(exc, self.retry_errors):
+            return True
+        if pyodbc is None or not isinstance(exc, pyodbc.Error) or not exc.args:
+            return False
+        return isinstance(exc.args[0], str) and exc.args[0].startswith("08")
+
+    @staticmethod
+    def _close_quietly(conn: Any) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self) -> Any:
+        """
+        Take a connection: a warm idle one (health-checked if it sat idle for
+        more than max_idle_s), or a new one. Give it back with release().
+        """
+        if self._closed:
+            raise RuntimeError("Connection pool is closed.")
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError(f"No free connection after {self.acquire_timeout} s (max_size={self.max_size}).")
+        try:
+            while True:
+                try:
+                    conn, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if time.monotonic() - last_used <= self.max_idle_s or self._healthy(conn):
+                    self._count("reuses")
+                    return conn
+                self._count("health_failures")
+                self._close_quietly(conn)
+
+            conn = self.connect(self.conn_str)
+            self._count("connects")
+            return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn: Any, broken: bool = False) -> None:
+        """
+        Give a connection back. Broken connections (and any connection once
+        the pool is closed) are closed instead of kept.
+        """
+        try:
+            if broken or self._closed:
+                self._close_quietly(conn)
+            else:
+                self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        `with pool.connection() as conn:` - the connection is discarded if the
+        block raises a connection error, and given back otherwise.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException as exc:
+            self.release(conn, broken=self._is_connection_error(exc))
+            raise
+        else:
+            self.release(conn)
+
+    def run(self, work: Callable[[Any], Any], retries: int = 1) -> Any:
+        """
+        Call work(conn) with a pooled connection. On a connection error the
+        connection is discarded and work is retried on a new one, up to
+        `retries` times. Any other error is raised at once.
+        """
+        for attempt in range(retries + 1):
+            try:
+                with self.connection() as conn:
+                    return work(conn)
+            except Exception as exc:
+                if attempt == retries or not self._is_connection_error(exc):
+                    raise
+                self._count("retries")
+
+    def close(self) -> None:
+        """
+        Close every idle connection. Connections in use are closed when released.
+        """
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close_quietly(conn)
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+        print(f"[POOL] {self.stats['connects']} connection(s) opened, {self.stats['reuses']} reuse(s), "
+              f"{self.stats['health_failures']} failed health check(s), {self.stats['retries']} retry(ies)")
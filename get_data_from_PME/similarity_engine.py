@@ -0,0 +1,89 @@
+from rapidfuzz import process
+from rapidfuzz.distance import Indel
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Choices shared by every task of a worker process (set once by init_worker)
+worker_choices = []
+
+def init_worker(choices: list):
+    """
+    Process pool initializer: ships the choices list once per process instead of once per chunk.
+    """
+    global worker_choices
+    worker_choices = choices
+
+def score_block(queries: list, choices: list, score_cutoff: int = 0, workers: int = 1) -> np.ndarray:
+    """
+    Scores a whole block of pairs at once with rapidfuzz's C implementation of
+    the indel distance, turned into the same 0-100 ratio as fuzzywuzzy's
+    fuzz.ratio: 100 * (lensum - distance) / lensum in float64, then rounded
+    half to even like Python's round (92.5 -> 92), 0 when a string is empty.
+
+    Parameters:
+    - queries: strings scored as rows
+    - choices: strings scored as columns
+    - score_cutoff: scores below this are returned as 0
+    - workers: threads used by rapidfuzz inside this call (-1 = all cores)
+
+    Returns:
+    - uint8 matrix of shape (len(queries), len(choices))
+    """
+    distances = process.cdist(queries, choices, scorer=Indel.distance, dtype=np.int32, workers=workers)
+    len_q = np.array([len(q) for q in queries], dtype=np.int64)[:, None]
+    len_c = np.array([len(c) for c in choices], dtype=np.int64)[None, :]
+    lensum = len_q + len_c
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Same operation order as python-Levenshtein's ratio, so the floats are identical
+        ratios = np.round(100 * ((lensum - distances) / lensum))
+    ratios[(len_q == 0) | (len_c == 0)] = 0
+    ratios[ratios < score_cutoff] = 0
+    return ratios.astype(np.uint8)
+
+def top_k_chunk(queries: list, choices: list | None, top_k: int, score_cutoff: int) -> list:
+    """
+    Worker task: scores one chunk of queries against all choices and keeps, per
+    query, the top_k (position, score) pairs with score >= score_cutoff, sorted by
+    score descending and then by position, so ties keep file order.
+    Only the kept pairs travel back to the parent process, not the full matrix.
+    choices=None uses the list set by init_worker.
+    """
+    if choices is None:
+        choices = worker_choices
+    scores = score_block(queries, choices, score_cutoff=score_cutoff)
+    k = min(top_k, scores.shape[1])
+    if k < scores.shape[1]:
+        # int16 before negating: -uint8 wraps around
+        part = np.argpartition(-scores.astype(np.int16), k - 1, axis=1)[:, :k]
+    else:
+        part = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+
+    rows = []
+    for row, cols in enumerate(part):
+        row_scores = scores[row, cols]
+        keep = row_scores >= max(score_cutoff, 1)
+        cols, row_scores = cols[keep], row_scores[keep]
+        order = np.lexsort((cols, -row_scores.astype(np.int16)))
+        rows.append((cols[order], row_scores[order]))
+    return rows
+
+def iter_top_k(queries: list, choices: list, top_k: int = 32, score_cutoff: int = 0,
+               workers: int | None = None, chunk_size: int = 512):
+    """
+    Yields, for every query in input order, (positions, scores) of its best
+    top_k choices (see top_k_chunk). Chunks of queries are spread over a
+    process pool of `workers` processes (default: all cores); workers=1 runs in
+    this process. Scoring is CPU-bound C code, so throughput grows with cores.
+    """
+    chunks = [queries[i:i + chunk_size] for i in range(0, len(queries), chunk_size)]
+
+    if workers == 1:
+        results = (top_k_chunk(chunk, choices, top_k, score_cutoff) for chunk in chunks)
+        for rows in results:
+            yield from rows
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(choices,)) as pool:
+        futures = [pool.submit(top_k_chunk, chunk, None, top_k, score_cutoff) for chunk in chunks]
+        for fut in futures:
+            yield from fut.result()
@@ -0,0 +1,401 @@
+"""
+Copy helpers shared by the file collection scripts
+==================================================
+
+Used by `getMedidores_mod2.py` and `../search_and_move_dirs/SearchAndMove.py`.
+
+- `safe_copy` copies one file into a folder without clobbering (rename / sync
+  modes) or replacing it (overwrite / replace modes).
+- `dedup_link` stores a file once in a content-addressed store (keyed by its
+  SHA-256) and hard- or symlinks it into the destination folder.
+- `run_copy_pipeline` consumes (source file, destination folder) jobs from a
+  discovery generator and copies them on a bounded thread pool, so slow network
+  writes overlap with the folder scan. It prints one throughput line at the end
+  instead of one line per file.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+# Copy modes accepted by `safe_copy`
+COPY_MODES = ("rename", "sync", "sync-hash", "overwrite", "replace")
+
+# Modes handled by `dedup_link`, mapped to the kind of link they create
+DEDUP_MODES = {"dedup-hardlink": "hardlink", "dedup-symlink": "symlink"}
+
+# Every mode accepted by `run_copy_pipeline`
+PIPELINE_MODES = COPY_MODES + tuple(DEDUP_MODES)
+
+# Folder name of the content-addressed store inside the destination root
+STORE_DIRNAME = ".store"
+
+# Two files whose mtimes differ by less than this are considered equal (FAT/SMB round mtimes to 2 s)
+MTIME_TOLERANCE_S = 2.0
+
+
+def file_digest(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Return the SHA-256 hex digest of a file, read in chunks.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def files_identical(src: Path, dst: Path, use_hash: bool = False) -> bool:
+    """
+    Decide whether `dst` already holds the same file as `src`.
+
+    Compares size and mtime (`shutil.copy2` preserves mtime, so an earlier copy
+    keeps it). With `use_hash`, files of equal size are compared by content
+    instead of mtime.
+    """
+    try:
+        s_stat, d_stat = src.stat(), dst.stat()
+    except OSError:
+        return False
+    if s_stat.st_size != d_stat.st_size:
+        return False
+    if use_hash:
+        return file_digest(src) == file_digest(dst)
+    return abs(s_stat.st_mtime - d_stat.st_mtime) < MTIME_TOLERANCE_S
+
+
+def safe_copy(
+    src: Path,
+    dst_dir: Path,
+    mode: str = "rename",
+    dst_names: Dict[Path, Dict[str, Any]] | None = None,
+    lock: Any = None,
+) -> Tuple[Path, str]:
+    """
+    Copy `src` into `dst_dir`.
+
+    If a file with the same name already exists, the copy gets ' (1)', ' (2)', ...
+    before the extension. In the "sync" and "sync-hash" modes, the existing
+    file and its renamed variants are compared first (see `files_identical`) and
+    the copy is skipped when one of them is identical to `src`. In "overwrite"
+    mode the existing file is simply replaced. "replace" skips the copy when
+    the file under the original name is identical (as "sync") and replaces it
+    otherwise, so a file that keeps changing has a single, latest copy.
+
+    `dst_names` caches, per destination folder, the names already taken and the
+    source file copied there in this run (None for files that were already
+    there). Each folder is therefore listed once instead of probing `exists()`
+    for every candidate, and a file still being copied by another thread is
+    compared through its source. Pass a `lock` when calling from several threads:
+    only the name lookup and reservation run under the lock; the comparisons
+    (a full hash in "sync-hash" mode) and the copy run outside it. A name
+    reserved for a copy that fails is released again.
+
+    Returns
+    -------
+    Tuple[Path, str]
+        The destination path and what happened: "copied", "renamed" or "skipped".
+    """
+    if mode not in COPY_MODES:
+        raise ValueError(f"Unknown copy mode '{mode}'. Use one of {COPY_MODES}.")
+    if dst_names is None:
+        dst_names = {}
+    if lock is None:
+        lock = threading.Lock()
+
+    stem, suffix = src.stem, src.suffix
+    candidate_name = src.name
+    k = 0
+    replace = mode == "overwrite"
+    while True:
+        with lock:
+            names = dst_names.get(dst_dir)
+            if names is None:
+                dst_dir.mkdir(parents=True, exist_ok=True)
+                names = dict.fromkeys(os.listdir(dst_dir))
+                dst_names[dst_dir] = names
+
+            if mode == "rename":
+                while candidate_name in names:
+                    k += 1
+                    candidate_name = f"{stem} ({k}){suffix}"
+            if replace or candidate_name not in names:
+                had_previous = candidate_name in names
+                previous = names.get(candidate_name)
+                names[candidate_name] = src
+                break
+            other = names[candidate_name] or dst_dir / candidate_name
+
+        # sync / replace modes: compare with the taken name outside the lock
+        if files_identical(src, other, use_hash=(mode == "sync-hash")):
+            return dst_dir / candidate_name, "skipped"
+        if mode == "replace":
+            replace = True
+            continue
+        k += 1
+        candidate_name = f"{stem} ({k}){suffix}"
+
+    candidate = dst_dir / candidate_name
+    try:
+        shutil.copy2(src, candidate)
+    except BaseException:
+        with lock:
+            if names.get(candidate_name) is src:
+                if had_previous:
+                    names[candidate_name] = previous
+                else:
+                    del names[candidate_name]
+        raise
+    return candidate, ("copied" if k == 0 else "renamed")
+
+
+def dedup_link(
+    src: Path,
+    dst_dir: Path,
+    store_dir: Path,
+    link: str = "hardlink",
+    dst_names: Dict[Path, Dict[str, Any]] | None = None,
+    lock: Any = None,
+    hash_locks: Dict[str, Any] | None = None,
+) -> Tuple[Path, str, str, bool]:
+    """
+    Place `src` into `dst_dir` through a content-addressed store.
+
+    The file is hashed (SHA-256) and copied once to
+    `store_dir/<first 2 hex>/<digest><suffix>`; every later file with the same
+    bytes only gets a new hard link (or relative symlink) to that object. Name
+    clashes in `dst_dir` are renamed with ' (k)' as in `safe_copy`, unless the
+    existing entry already holds the same object, in which case nothing is
+    done. If the filesystem refuses hard links, the object is copied instead;
+    such a copy is recognised on the next run by its SHA-256 (as in
+    "sync-hash"), so reruns do not pile up ' (k)' copies.
+
+    `dst_names`, `lock` and `hash_locks` are shared between threads by
+    `run_copy_pipeline`; the object for a given digest is written by one thread
+    at a time, and existing files are hashed outside `lock`.
+
+    Returns
+    -------
+    Tuple[Path, str, str, bool]
+        Destination path, outcome, digest and whether a new object was stored.
+        Outcome is "copied" (placed under the original name, new object),
+        "deduped" (placed under the original name, object already in the
+        store), "renamed" (placed under a ' (k)' name) or "skipped" (the
+        destination already held this object).
+    """
+    if link not in ("hardlink", "symlink"):
+        raise ValueError(f"Unknown link type '{link}'. Use 'hardlink' or 'symlink'.")
+    if dst_names is None:
+        dst_names = {}
+    if lock is None:
+        lock = threading.Lock()
+    if hash_locks is None:
+        hash_locks = {}
+
+    digest = file_digest(src)
+    obj = store_dir / digest[:2] / f"{digest}{src.suffix.lower()}"
+
+    with lock:
+        obj_lock = hash_locks.setdefault(digest, threading.Lock())
+    with obj_lock:
+        stored = False
+        if not obj.exists():
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            tmp = obj.with_name(obj.name + ".tmp")
+            shutil.copy2(src, tmp)
+            os.replace(tmp, obj)
+            stored = True
+
+    stem, suffix = src.stem, src.suffix
+    candidate_name = src.name
+    k = 0
+    while True:
+        with lock:
+            names = dst_names.get(dst_dir)
+            if names is None:
+                dst_dir.mkdir(parents=True, exist_ok=True)
+                names = dict.fromkeys(os.listdir(dst_dir))
+                dst_names[dst_dir] = names
+
+            while candidate_name in names and names[candidate_name] is not None:
+                if names[candidate_name] == digest:
+                    return dst_dir / candidate_name, "skipped", digest, stored
+                k += 1
+                candidate_name = f"{stem} ({k}){suffix}"
+            if candidate_name not in names:
+                names[candidate_name] = digest
+                break
+
+        # A file that was already there: same object (link) or same content (copy fallback)?
+        existing = dst_dir / candidate_name
+        existing_digest = None
+        try:
+            if os.path.samefile(existing, obj):
+                existing_digest = digest
+            elif existing.stat().st_size == obj.stat().st_size:
+                existing_digest = file_digest(existing)
+        except OSError:
+            pass
+        if existing_digest is not None:
+            with lock:
+                # Remember its digest, so later files do not hash it again
+                if names.get(candidate_name) is None:
+                    names[candidate_name] = existing_digest
+            if existing_digest == digest:
+                return existing, "skipped", digest, stored
+        k += 1
+        candidate_name = f"{stem} ({k}){suffix}"
+
+    candidate = dst_dir / candidate_name
+    try:
+        if link == "symlink":
+            os.symlink(os.path.relpath(obj, dst_dir), candidate)
+        else:
+            try:
+                os.link(obj, candidate)
+            except OSError:
+                # Filesystem without hard links (some SMB shares): fall back to a plain copy
+                shutil.copy2(obj, candidate)
+    except BaseException:
+        with lock:
+            if names.get(candidate_name) == digest:
+                del names[candidate_name]
+        raise
+    if k > 0:
+        return candidate, "renamed", digest, stored
+    return candidate, ("copied" if stored else "deduped"), digest, stored
+
+
+def run_copy_pipeline(
+    jobs: Iterable[Tuple[Path, Path]],
+    workers: int = 8,
+    mode: str = "rename",
+    max_pending: int | None = None,
+    store_dir: Path | None = None,
+) -> Tuple[List[Tuple[Path, Path, str]], Dict[str, float]]:
+    """
+    Copy files as they are discovered, on a bounded thread pool.
+
+    `jobs` yields (source file, destination folder) pairs; it is usually a
+    generator that walks the source tree, so the scan keeps running in this
+    thread while up to `workers` copies run in the background. At most
+    `max_pending` copies (default 4 x workers) are queued at once, so a fast
+    scan cannot pile up an unbounded backlog.
+
+    `mode` is one of the `safe_copy` modes, or "dedup-hardlink" /
+    "dedup-symlink" to go through `dedup_link` with the store in `store_dir`.
+    In "overwrite" and "replace" modes, when several jobs target the same
+    destination file, the last job submitted wins, whatever the thread timing:
+    copies to the same file run one at a time, and a job already superseded by
+    a later one is reported as "skipped" without copying.
+
+    Copies that fail are reported with an [ERROR] line and counted as "failed";
+    the other copies go on.
+
+    Returns
+    -------
+    Tuple[List[Tuple[Path, Path, str]], Dict[str, float]]
+        - (source, destination, outcome) for every job, in submission order.
+          Outcome is "copied", "renamed", "skipped", "deduped" or "failed".
+        - Stats: per-outcome counts, 'bytes' written, 'seconds', 'mb_per_s'
+          and 'files_per_s' (files actually written). Dedup modes also report
+          'unique_objects', 'bytes_saved' and 'dedup_ratio' (files placed per
+          unique object).
+    """
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown copy mode '{mode}'. Use one of {PIPELINE_MODES}.")
+    if mode in DEDUP_MODES and store_dir is None:
+        raise ValueError(f"Copy mode '{mode}' needs a store_dir.")
+
+    workers = max(1, workers)
+    slots = threading.BoundedSemaphore(max_pending or workers * 4)
+    dst_names: Dict[Path, Dict[str, Any]] = {}
+    names_lock = threading.Lock()
+    # In overwrite / replace mode two sources may target the same file; their copies must not interleave,
+    # and only the last job submitted for a file writes it
+    overwrite_locks: Dict[Path, Any] = {}
+    last_job_for: Dict[Path, int] = {}
+    hash_locks: Dict[str, Any] = {}
+
+    def copy_job(seq: int, src: Path, dst_dir: Path) -> Tuple[Path, Path, str, int, int, str | None]:
+        # Returns (src, destination, outcome, bytes written, bytes not written again, digest)
+        try:
+            if mode in DEDUP_MODES:
+                final_dst, outcome, digest, stored = dedup_link(
+                    src, dst_dir, store_dir, link=DEDUP_MODES[mode],
+                    dst_names=dst_names, lock=names_lock, hash_locks=hash_locks,
+                )
+                size = src.stat().st_size
+                if stored:
+                    return src, final_dst, outcome, size, 0, digest
+                return src, final_dst, outcome, 0, (size if outcome != "skipped" else 0), digest
+            if mode in ("overwrite", "replace"):
+                target = dst_dir / src.name
+                with names_lock:
+                    path_lock = overwrite_locks.setdefault(target, threading.Lock())
+                with path_lock:
+                    with names_lock:
+                        superseded = last_job_for[target] > seq
+                    if superseded:
+                        return src, target, "skipped", 0, 0, None
+                    final_dst, outcome = safe_copy(src, dst_dir, mode=mode, dst_names=dst_names, lock=names_lock)
+            else:
+                final_dst, outcome = safe_copy(src, dst_dir, mode=mode, dst_names=dst_names, lock=names_lock)
+            size = src.stat().st_size if outcome != "skipped" else 0
+            return src, final_dst, outcome, size, 0, None
+        except OSError as e:
+            print(f"[ERROR] Could not copy {src} -> {dst_dir}: {e}")
+            return src, dst_dir, "failed", 0, 0, None
+        finally:
+            slots.release()
+
+    start = time.perf_counter()
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for seq, (src, dst_dir) in enumerate(jobs):
+            slots.acquire()
+            if mode in ("overwrite", "replace"):
+                with names_lock:
+                    last_job_for[dst_dir / src.name] = seq
+            futures.append(pool.submit(copy_job, seq, src, dst_dir))
+    elapsed = time.perf_counter() - start
+
+    results: List[Tuple[Path, Path, str]] = []
+    stats: Dict[str, float] = {"copied": 0, "renamed": 0, "skipped": 0, "deduped": 0, "failed": 0, "bytes": 0}
+    digests = set()
+    bytes_saved = 0
+    for fut in futures:
+        src, final_dst, outcome, written_bytes, saved_bytes, digest = fut.result()
+        results.append((src, final_dst, outcome))
+        stats[outcome] += 1
+        if digest is not None:
+            digests.add(digest)
+        stats["bytes"] += written_bytes
+        bytes_saved += saved_bytes
+
+    written = stats["copied"] + stats["renamed"]
+    stats["seconds"] = elapsed
+    stats["mb_per_s"] = stats["bytes"] / 1e6 / elapsed if elapsed > 0 else 0.0
+    stats["files_per_s"] = written / elapsed if elapsed > 0 else 0.0
+
+    print(
+        f"[PIPELINE] {int(written)} file(s) written, {stats['bytes'] / 1e6:.1f} MB in {elapsed:.2f} s "
+        f"-> {stats['mb_per_s']:.1f} MB/s, {stats['files_per_s']:.1f} files/s "
+        f"(workers={workers}, skipped={int(stats['skipped'])}, failed={int(stats['failed'])})"
+    )
+
+    if mode in DEDUP_MODES:
+        placed = len(results) - stats["failed"]
+        stats["unique_objects"] = len(digests)
+        stats["bytes_saved"] = bytes_saved
+        stats["dedup_ratio"] = placed / len(digests) if digests else 0.0
+        print(
+            f"[DEDUP] {int(placed)} file(s) placed from {len(digests)} unique object(s) "
+            f"(ratio {stats['dedup_ratio']:.2f}x, {bytes_saved / 1e6:.1f} MB not written again)"
+        )
+    return results, stats
@@ -0,0 +1,108 @@
+"""
+Compiled filename matcher shared by the file collection scripts
+===============================================================
+
+Used by `getMedidores_mod2.py` and `../search_and_move_dirs/SearchAndMove.py`.
+
+A required-file list can mix three kinds of entries:
+
+- exact names:  ``names_of_meters.xls``           → looked up in a hashed set
+- glob patterns: ``*_medidor_*.xls``              → any entry with * or ?
+- regexes:      ``re:^M\\d{4}_.*\\.xls$``          → entries prefixed with "re:"
+
+Square brackets alone do not make a glob, so ``Report [2025].xls`` stays an
+exact name; inside a glob (``M[0-9]*.xls``) they are a character class.
+
+`compile_filename_matcher` builds the set and one combined regex for all
+patterns once, so checking a filename costs one set lookup plus (only when
+patterns were given) one regex match, however long the list gets. Regexes
+with groups (backreferences, named groups) or leading inline flags such as
+``(?i)`` would break once merged, so they are kept as separate compiled
+patterns and tried (with `fullmatch`) after the combined one.
+"""
+
+import fnmatch
+import re
+from typing import Callable, Iterable, List, Tuple
+
+REGEX_PREFIX = "re:"
+GLOB_CHARS = ("*", "?")
+# Inline flags at the start of a regex, e.g. "(?i)"; they are only valid there
+GLOBAL_FLAGS = re.compile(r"\(\?[aiLmsux]+\)")
+
+
+def split_filename_patterns(entries: Iterable[str]) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Sort required-file entries into (exact names, glob patterns, regexes).
+    """
+    exact, globs, regexes = [], [], []
+    for entry in entries:
+        if entry.startswith(REGEX_PREFIX):
+            regexes.append(entry[len(REGEX_PREFIX):])
+        elif any(c in entry for c in GLOB_CHARS):
+            globs.append(entry)
+        else:
+            exact.append(entry)
+    return exact, globs, regexes
+
+
+def compile_filename_matcher(
+    exact_names: Iterable[str] = (),
+    globs: Iterable[str] = (),
+    regexes: Iterable[str] = (),
+    case_sensitive: bool = False,
+) -> Callable[[str], bool]:
+    """
+    Compile exact names, glob patterns and regexes into a single predicate.
+
+    Globs and regexes must match the whole filename. Each regex is compiled on
+    its own first, as written, so syntax errors are raised here (`re.error`)
+    naming the bad regex, not while walking the tree.
+
+    Returns
+    -------
+    Callable[[str], bool]
+        `match(filename)` → True if the filename is wanted.
+    """
+    if case_sensitive:
+        exact_set = frozenset(exact_names)
+    else:
+        exact_set = frozenset(n.lower() for n in exact_names)
+
+    flags = 0 if case_sensitive else re.IGNORECASE
+    parts = [fnmatch.translate(g) for g in globs]
+    separate = []
+    for r in regexes:
+        try:
+            alone = re.compile(r, flags)
+        except re.error as e:
+            raise re.error(f"Invalid regex '{REGEX_PREFIX}{r}': {e}") from e
+        # Group numbers shift (and names may clash) inside the alternation,
+        # and global flags are only allowed at the start of the whole pattern
+        if alone.groups or GLOBAL_FLAGS.match(r):
+            separate.append(alone)
+        else:
+            parts.append(f"(?:{r})\\Z")
+
+    matchers = [p.fullmatch for p in separate]
+    if parts:
+        matchers.insert(0, re.compile("|".join(f"(?:{p})" for p in parts), flags).match)
+
+    if not matchers:
+        if case_sensitive:
+            return exact_set.__contains__
+        return lambda filename: filename.lower() in exact_set
+
+    def match(filename: str) -> bool:
+        key = filename if case_sensitive else filename.lower()
+        return key in exact_set or any(m(filename) is not None for m in matchers)
+
+    return match
+
+
+def filename_matcher_from_entries(entries: Iterable[str], case_sensitive: bool = False) -> Callable[[str], bool]:
+    """
+    Shortcut for `compile_filename_matcher(*split_filename_patterns(entries), ...)`.
+    """
+    exact, globs, regexes = split_filename_patterns(entries)
+    return compile_filename_matcher(exact, globs, regexes, case_sensitive=case_sensitive)
@@ -1,7 +1,205 @@
+import argparse
+import json
 import os
-import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Set, Tuple
+
+from copy_pipeline import DEDUP_MODES, STORE_DIRNAME, run_copy_pipeline
+from filename_matcher import compile_filename_matcher, split_filename_patterns
+
+# Bump when the on-disk layout of the file index changes
+FILE_INDEX_VERSION = 1
+
+# Copy modes that make sense when collecting into "Name A" folders
+COLLECT_COPY_MODES = ("rename", "sync", "sync-hash", "replace") + tuple(DEDUP_MODES)
+
+
+def os_walk_dirs(
+    src_root: Path,
+    ignore_set: Set[str],
+    stats: Dict[str, float] | None = None,
+) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Single-threaded walker on top of `os.walk`.
+
+    Yields (folder, filenames) for every visited folder, pruning any
+    subfolder whose name is in `ignore_set`. If `stats` is given, the number
+    of listed folders is stored under the key 'dirs'.
+    """
+    if stats is not None:
+        stats["dirs"] = 0
+    for root, dirnames, filenames in os.walk(src_root):
+        if stats is not None:
+            stats["dirs"] += 1
+        # Prune ignored dirs in-place for os.walk
+        pruned = [d for d in dirnames if d in ignore_set]
+        for d in pruned:
+            print(f"[SKIP] Ignoring directory: {Path(root) / d}")
+        dirnames[:] = [d for d in dirnames if d not in ignore_set]
+        yield root, filenames
+
+
+def parallel_scandir_walk(
+    src_root: Path,
+    ignore_set: Set[str],
+    workers: int = 8,
+    stats: Dict[str, float] | None = None,
+    index: Dict[str, Dict[str, Any]] | None = None,
+    keep_file: Callable[[str], bool] | None = None,
+) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Concurrent walker on top of `os.scandir`, meant for network shares where
+    every directory listing is a round trip.
+
+    Up to `workers` folders are listed at the same time; subfolders are queued
+    as soon as their parent listing comes back. Yields (folder, filenames) like
+    `os_walk_dirs`, but in completion order rather than top-down order.
+    Folders that cannot be listed are skipped silently, as `os.walk` does.
+
+    If `keep_file` is given, only filenames for which it returns True are yielded.
+
+    If `index` is given (see `load_file_index`), every folder is only stat'ed:
+    when its mtime matches the indexed one, its subfolders and kept filenames
+    are taken from the index instead of listing it again. On return, `index`
+    holds exactly the folders visited in this walk, ready for `save_file_index`.
+
+    If `stats` is given, the number of visited folders is stored under 'dirs'
+    and the number of them served from the index under 'cached'.
+    """
+    previous = dict(index) if index is not None else {}
+    if index is not None:
+        index.clear()
+
+    def list_dir(folder: str) -> Tuple[str, List[str], List[str], bool]:
+        mtime = None
+        if index is not None:
+            try:
+                mtime = os.stat(folder).st_mtime_ns
+            except OSError:
+                return folder, [], [], False
+            cached = previous.get(folder)
+            if cached is not None and cached["mtime"] == mtime:
+                index[folder] = cached
+                return folder, cached["subdirs"], cached["files"], True
+
+        subdirs: List[str] = []
+        files: List[str] = []
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                        else:
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        if keep_file is not None:
+            files = [f for f in files if keep_file(f)]
+        if index is not None:
+            # mtime was read before listing, so a change in between only forces a relist next run
+            index[folder] = {"mtime": mtime, "subdirs": subdirs, "files": files}
+        return folder, subdirs, files, False
+
+    if stats is not None:
+        stats["dirs"] = 0
+        stats["cached"] = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = {pool.submit(list_dir, str(src_root))}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                folder, subdirs, files, from_index = fut.result()
+                if stats is not None:
+                    stats["dirs"] += 1
+                    stats["cached"] += from_index
+                for d in subdirs:
+                    if d in ignore_set:
+                        print(f"[SKIP] Ignoring directory: {Path(folder) / d}")
+                    else:
+                        pending.add(pool.submit(list_dir, os.path.join(folder, d)))
+                yield folder, files
+
+
+def load_file_index(index_path: str | Path, settings: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Load the per-folder file index written by `save_file_index`.
+
+    The index maps every visited folder to its mtime (ns), subfolder names and
+    matched filenames. It is only reused when it was built with the same
+    `settings` (source root, required names, case sensitivity); otherwise an
+    empty index is returned and the next walk lists every folder again.
+    """
+    path = Path(index_path)
+    if not path.exists():
+        print(f"[INDEX] No index at {path}. Doing a full scan.")
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Could not read index {path} ({e}). Doing a full scan.")
+        return {}
+
+    if data.get("version") != FILE_INDEX_VERSION or data.get("settings") != settings:
+        print(f"[INDEX] Index {path} was built with other settings. Doing a full scan.")
+        return {}
+
+    dirs = data.get("dirs", {})
+    print(f"[INDEX] Loaded {len(dirs)} folder(s) from {path}")
+    return dirs
+
+
+def save_file_index(index_path: str | Path, settings: Dict[str, Any], dirs: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Write the file index as human-readable JSON. The file is written next to
+    its final location and then swapped in, so an interrupted run never leaves
+    a half-written index behind.
+    """
+    path = Path(index_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    data = {
+        "version": FILE_INDEX_VERSION,
+        "settings": settings,
+        "saved_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "dirs": dirs,
+    }
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, ensure_ascii=False)
+    os.replace(tmp, path)
+    print(f"[INDEX] Saved {len(dirs)} folder(s) to {path}")
+
+
+def show_file_index(index_path: str | Path) -> None:
+    """
+    Print the settings of a file index and the folders where it recorded matches.
+    """
+    path = Path(index_path)
+    if not path.exists():
+        print(f"No index at {path}")
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    dirs = data.get("dirs", {})
+    with_files = {k: v["files"] for k, v in dirs.items() if v["files"]}
+    print(f"=== FILE INDEX: {path} ===")
+    print(f"Version: {data.get('version')}")
+    print(f"Saved at: {data.get('saved_at')}")
+    for key, value in data.get("settings", {}).items():
+        print(f"{key}: {value}")
+    print(f"Folders indexed: {len(dirs)}")
+    print(f"Folders with matches: {len(with_files)}")
+    for folder, files in sorted(with_files.items()):
+        print(f"  - {folder}: {', '.join(files)}")
+    print("==========================\n")
+
 
 def collect_required_xls(
     required_filenames: Tuple[str, ...],
@@ -9,7 +207,13 @@ def collect_required_xls(
     path_b: str | Path,
     ignore_dirs: Tuple[str, ...] = (),
     *,
-    case_sensitive: bool = True
+    case_sensitive: bool = True,
+    walker: str = "os.walk",
+    workers: int = 8,
+    index_path: str | Path | None = None,
+    copy_mode: str = "rename",
+    copy_workers: int = 8,
+    verbose: bool = False,
 ) -> Dict[str, List[Path]]:
     """
     Recursively search Path A for the required .xls files, skipping any folders
@@ -17,14 +221,19 @@ def collect_required_xls(
       - Determine the relative path (to Path A) where it was found (*print*),
       - Take the first folder name in that relative path "Name A" (*print*),
       - Create a folder under Path B named "Name A" (*print*; this is the 'folder extra'),
-      - Copy the file into that folder. If a duplicate filename exists, auto-rename.
+      - Copy the file into that folder. If a duplicate filename exists, auto-rename
+        (or skip it when an identical copy exists, see `copy_mode`).
 
-    Prints tracking lines for the steps marked with '*' and some extra info.
+    With `verbose`, prints tracking lines for the steps marked with '*' and some extra info.
+    Copies run on a thread pool while the scan continues; the summary reports
+    the aggregate throughput (MB/s, files/s).
 
     Parameters
     ----------
     required_filenames : Tuple[str, ...]
-        Exact filenames (including extension) to search for. Must be `.xls`.
+        Filenames (including extension) to search for. Must be `.xls`.
+        Entries may also be glob patterns (e.g. '*_medidor_*.xls') or regexes
+        prefixed with 're:'; see `filename_matcher.py`.
     path_a : str | Path
         Root directory to search in (source).
     path_b : str | Path
@@ -33,6 +242,33 @@ def collect_required_xls(
         Folder names to skip anywhere in the tree (matched by exact name).
     case_sensitive : bool, optional
         If False, match required filenames case-insensitively.
+    walker : str, optional
+        "os.walk" (default) lists one folder at a time. "parallel" lists folders
+        concurrently with `os.scandir`, which is much faster on mapped network
+        shares. Both modes report the listing rate (folders per second).
+    workers : int, optional
+        Number of concurrent folder listings when `walker="parallel"`.
+    index_path : str | Path | None, optional
+        JSON file used as a persistent folder index. When given, only folders
+        whose mtime changed since the last run are listed again; the others are
+        served from the index. Implies the scandir walker with `workers` threads.
+    copy_mode : str, optional
+        "rename" (default) always copies, renaming to ' (k)' on name clashes.
+        "sync" skips files already present in Path B with the same size and
+        mtime; "sync-hash" compares size and content hash instead. Reruns in a
+        sync mode do not grow Path B.
+        "replace" skips identical files as "sync" does, and replaces the copy
+        of a file that changed instead of adding a ' (k)' copy.
+        "dedup-hardlink" / "dedup-symlink" store every unique file once in
+        `Path B/.store` (keyed by SHA-256) and link it into each "Name A" folder;
+        the summary then reports the dedup ratio.
+    copy_workers : int, optional
+        Number of concurrent copies. Files are copied on a thread pool while the
+        scan goes on (see `copy_pipeline.run_copy_pipeline`).
+    verbose : bool, optional
+        Print the tracking lines for every file found and copied. When False
+        (default), only the settings, skipped folders and the aggregate summary
+        are printed, which matters on trees with many matches.
 
     Returns
     -------
@@ -44,8 +280,15 @@ def collect_required_xls(
     ------
     FileNotFoundError
         If path_a does not exist or is not a directory.
+    ValueError
+        If `walker` is not one of "os.walk" or "parallel", or `copy_mode` is unknown.
     """
 
+    if walker not in ("os.walk", "parallel"):
+        raise ValueError(f"Unknown walker '{walker}'. Use 'os.walk' or 'parallel'.")
+    if copy_mode not in COLLECT_COPY_MODES:
+        raise ValueError(f"Unknown copy mode '{copy_mode}'. Use one of {COLLECT_COPY_MODES}.")
+
     # --- Resolve & validate roots
     src_root = Path(path_a).resolve()
     dst_root = Path(path_b).resolve()
@@ -55,132 +298,151 @@ def collect_required_xls(
 
     dst_root.mkdir(parents=True, exist_ok=True)
 
-    # --- Normalize required filenames
-    def norm(s: str) -> str:
-        return s if case_sensitive else s.lower()
+    # --- Split required entries into exact names, globs and regexes
+    exact_names, glob_patterns, regex_patterns = split_filename_patterns(required_filenames)
 
-    # Keep only .xls (warn about others)
+    # Keep only .xls (warn about others); regexes are checked against .xls files only
     required_xls = []
-    for name in required_filenames:
+    for name in exact_names + glob_patterns:
         if name.lower().endswith(".xls"):
             required_xls.append(name)
         else:
             print(f"[WARN] Skipping non-.xls required name: {name}")
+    required_globs = [g for g in glob_patterns if g in required_xls]
+    required_exact = [n for n in exact_names if n in required_xls]
 
-    if not required_xls:
+    if not required_xls and not regex_patterns:
         print("[INFO] No valid .xls filenames provided. Nothing to do.")
         return {}
 
-    required_set = set(norm(n) for n in required_xls)
+    # Compiled once: hashed set for exact names, one combined regex for patterns
+    matcher = compile_filename_matcher(required_exact, required_globs, regex_patterns, case_sensitive=case_sensitive)
+
+    def is_required(filename: str) -> bool:
+        return filename.lower().endswith(".xls") and matcher(filename)
+
     ignore_set = set(ignore_dirs)  # directory names, matched exactly
 
     print("=== SEARCH SETTINGS ===")
     print(f"Path A (source): {src_root}")
     print(f"Path B (destination base): {dst_root}")
-    print(f"Required .xls filenames: {required_xls}")
+    print(f"Required .xls filenames: {required_exact if len(required_exact) <= 20 else f'{len(required_exact)} names'}")
+    if required_globs or regex_patterns:
+        print(f"Required patterns: {required_globs + ['re:' + r for r in regex_patterns]}")
     print(f"Ignored folder names: {sorted(ignore_set) if ignore_set else '(none)'}")
     print(f"Case-sensitive matching: {case_sensitive}")
+    print(f"Walker: {walker}" + (f" ({workers} workers)" if walker == "parallel" else ""))
+    print(f"Copy mode: {copy_mode} ({copy_workers} copy workers)")
     print("=======================\n")
 
     copied_index: Dict[str, List[Path]] = {}
 
-    def safe_copy(src: Path, dst_dir: Path) -> Path:
+    # Walk the tree
+    walk_stats: Dict[str, float] = {}
+    index_settings = {
+        "root": str(src_root),
+        "required": sorted(required_exact + required_globs) + sorted("re:" + r for r in regex_patterns),
+        "case_sensitive": case_sensitive,
+    }
+    file_index = None
+    if index_path is not None:
+        file_index = load_file_index(index_path, index_settings)
+        folders = parallel_scandir_walk(
+            src_root, ignore_set, workers=workers, stats=walk_stats,
+            index=file_index, keep_file=is_required,
+        )
+    elif walker == "parallel":
+        folders = parallel_scandir_walk(src_root, ignore_set, workers=workers, stats=walk_stats)
+    else:
+        folders = os_walk_dirs(src_root, ignore_set, stats=walk_stats)
+
+    # "Name A" of every file found, to group the copy results afterwards
+    name_a_of: Dict[Path, str] = {}
+
+    def discover() -> Iterator[Tuple[Path, Path]]:
         """
-        Copy `src` into `dst_dir`. If a file with the same name already exists,
-        append ' (1)', ' (2)', ... before the extension.
-        Returns the final destination path.
+        Producer side of the copy pipeline: yields (file found, "folder extra").
         """
-        dst_dir.mkdir(parents=True, exist_ok=True)
-        candidate = dst_dir / src.name
-        if not candidate.exists():
-            shutil.copy2(src, candidate)
-            return candidate
-
-        stem, suffix = src.stem, src.suffix
-        k = 1
-        while True:
-            candidate = dst_dir / f"{stem} ({k}){suffix}"
-            if not candidate.exists():
-                shutil.copy2(src, candidate)
-                return candidate
-            k += 1
+        walk_start = time.perf_counter()
+        for root, filenames in folders:
+            # Check each filename against the compiled matcher (constant cost per file)
+            for filename in filenames:
+                if not is_required(filename):
+                    continue
 
-    # Walk the tree
-    for root, dirnames, filenames in os.walk(src_root):
-        # Prune ignored dirs in-place for os.walk
-        pruned = [d for d in dirnames if d in ignore_set]
-        if pruned:
-            for d in pruned:
-                print(f"[SKIP] Ignoring directory: {Path(root) / d}")
-        dirnames[:] = [d for d in dirnames if d not in ignore_set]
+                # Build paths
+                src_file = Path(root) / filename
 
-        # Prepare filename comparison
-        if case_sensitive:
-            candidates = set(filenames)
-        else:
-            # map lower->originals to preserve original name for display
-            lower_map = {fn.lower(): fn for fn in filenames}
-            candidates = set(lower_map.keys())
-
-        # Check each required filename
-        for req in required_set:
-            hit = None
-            if case_sensitive:
-                if req in candidates:
-                    hit = req
-            else:
-                if req in candidates:
-                    hit = lower_map[req]
-
-            if hit is None:
-                continue  # not found in this folder
-
-            # Build paths
-            src_file = Path(root) / (hit if case_sensitive else lower_map[req])
-
-            # * Print: file found path
-            print(f"[*] File found*: {src_file}")
-
-            # Compute relative path to Path A
-            rel_dir = src_file.parent.relative_to(src_root)
-            # * Print: relative path
-            print(f"[*] Relative path* (to Path A): {rel_dir if str(rel_dir) != '.' else '(.)'}")
-
-            # Extract first folder name (Name A)
-            parts = rel_dir.parts
-            name_a = parts[0] if len(parts) > 0 else "__ROOT__"  # fallback if file is at the root of Path A
-            # * Print: first folder name
-            print(f"[*] First folder name* (Name A): {name_a}")
-
-            # Destination folder inside Path B (this is the "folder extra")
-            dst_dir = dst_root / name_a
-            # * Print: folder extra path
-            print(f"[*] Folder extra* to create/use: {dst_dir}")
-
-            # Copy (with duplicate-safe rename)
-            final_dst = safe_copy(src_file, dst_dir)
-            if final_dst.name != src_file.name:
+                # Compute relative path to Path A
+                rel_dir = src_file.parent.relative_to(src_root)
+
+                # Extract first folder name (Name A)
+                parts = rel_dir.parts
+                name_a = parts[0] if len(parts) > 0 else "__ROOT__"  # fallback if file is at the root of Path A
+
+                # Destination folder inside Path B (this is the "folder extra")
+                dst_dir = dst_root / name_a
+
+                if verbose:
+                    # * Print: file found path, relative path, first folder name, folder extra path
+                    print(f"[*] File found*: {src_file}")
+                    print(f"[*] Relative path* (to Path A): {rel_dir if str(rel_dir) != '.' else '(.)'}")
+                    print(f"[*] First folder name* (Name A): {name_a}")
+                    print(f"[*] Folder extra* to create/use: {dst_dir}")
+
+                name_a_of[src_file] = name_a
+                yield src_file, dst_dir
+
+            # Optional: extra trace line per visited folder
+            # print(f"[TRACE] Visited: {root}")
+
+        walk_stats["seconds"] = time.perf_counter() - walk_start
+
+    # Copy (with duplicate-safe rename, or skip if already synced) while the scan goes on
+    results, copy_stats = run_copy_pipeline(discover(), workers=copy_workers, mode=copy_mode,
+                                            store_dir=dst_root / STORE_DIRNAME)
+
+    for src_file, final_dst, outcome in results:
+        if verbose:
+            if outcome == "renamed":
                 print(f"[COPY] Duplicate detected. Copied with rename to: {final_dst}")
-            else:
+            elif outcome == "skipped":
+                print(f"[SKIP] Identical file already in Path B: {final_dst}")
+            elif outcome == "deduped":
+                print(f"[LINK] Same content already stored. Linked to: {final_dst}")
+            elif outcome == "copied":
                 print(f"[COPY] Copied to: {final_dst}")
-
+        if outcome != "failed":
             # Track results
-            copied_index.setdefault(name_a, []).append(final_dst)
+            copied_index.setdefault(name_a_of[src_file], []).append(final_dst)
 
-        # Optional: extra trace line per visited folder
-        # print(f"[TRACE] Visited: {root}")
+    if file_index is not None:
+        save_file_index(index_path, index_settings, file_index)
 
     # Summary
     print("\n=== SUMMARY ===")
+    dirs_listed = int(walk_stats.get("dirs", 0))
+    walk_elapsed = walk_stats.get("seconds", 0.0)
+    rate = dirs_listed / walk_elapsed if walk_elapsed > 0 else float("inf")
+    print(f"Folders listed: {dirs_listed} in {walk_elapsed:.2f} s ({rate:.1f} folders/s, walker={walker if file_index is None else 'parallel+index'})")
+    if file_index is not None:
+        print(f"Folders served from index: {int(walk_stats.get('cached', 0))}/{dirs_listed}")
     if not copied_index:
         print("No required files were found.")
     else:
         total = sum(len(v) for v in copied_index.values())
-        print(f"Total files copied: {total}")
+        print(f"Total files found: {total}")
+        print(f"  copied: {int(copy_stats['copied'])} | renamed: {int(copy_stats['renamed'])} | "
+              f"skipped (identical): {int(copy_stats['skipped'])} | failed: {int(copy_stats['failed'])}")
+        if copy_mode in DEDUP_MODES:
+            print(f"  deduped: {int(copy_stats['deduped'])} | unique objects: {int(copy_stats['unique_objects'])} | "
+                  f"dedup ratio: {copy_stats['dedup_ratio']:.2f}x")
+        print(f"Copy throughput: {copy_stats['mb_per_s']:.1f} MB/s, {copy_stats['files_per_s']:.1f} files/s")
         for k, v in copied_index.items():
             print(f"  - {k}: {len(v)} file(s)")
-            for p in v:
-                print(f"      • {p}")
+            if verbose:
+                for p in v:
+                    print(f"      • {p}")
     print("================\n")
 
     return copied_index
@@ -201,6 +463,51 @@ if __name__ == "__main__":
 
     output_path = r'Output\2025'
 
-    ignored_folders = ('Excluded files')
-
-    collect_required_xls(searched_files, year_path, output_path, ignore_dirs=ignored_folders, case_sensitive=False)
\ No newline at end of file
+    ignored_folders = ('Excluded files',)
+
+    index_file = r'Output\2025_file_index.json'
+
+    parser = argparse.ArgumentParser(description="Collect required .xls meter files from Path A into Path B.")
+    parser.add_argument("--source", default=year_path, help="Path A (source root)")
+    parser.add_argument("--dest", default=output_path, help="Path B (destination root)")
+    parser.add_argument("--walker", choices=("os.walk", "parallel"), default="parallel")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--copy-workers", type=int, default=8)
+    parser.add_argument("--verbose", action="store_true",
+                        help="Print the tracking lines for every file, not only the aggregate summary")
+    parser.add_argument("--copy-mode", choices=COLLECT_COPY_MODES, default="sync",
+                        help="rename: always copy; sync / sync-hash: skip files already in Path B; "
+                             "replace: skip identical files, replace changed ones")
+    parser.add_argument("--index", default=index_file, help="Folder index file used for incremental rescans")
+    parser.add_argument("--no-index", action="store_true", help="Always crawl the full tree, without reading or writing the index")
+    parser.add_argument("--show-index", action="store_true", help="Print the folder index and exit")
+    parser.add_argument("--invalidate-index", action="store_true", help="Delete the folder index before running")
+    parser.add_argument("--watch", action="store_true", help="Keep running and copy new or modified files as they land")
+    parser.add_argument("--watch-backend", choices=("auto", "inotify", "poll"), default="auto",
+                        help="inotify needs the watchdog package; use poll on SMB mounts")
+    parser.add_argument("--poll-interval", type=float, default=10.0, help="Seconds between scans with --watch-backend poll")
+    args = parser.parse_args()
+
+    if args.show_index:
+        show_file_index(args.index)
+        raise SystemExit(0)
+
+    if args.invalidate_index:
+        Path(args.index).unlink(missing_ok=True)
+        print(f"[INDEX] Removed {args.index}")
+
+    def catch_up():
+        return collect_required_xls(searched_files, args.source, args.dest, ignore_dirs=ignored_folders,
+                                    case_sensitive=False, walker=args.walker, workers=args.workers,
+                                    copy_mode=args.copy_mode, copy_workers=args.copy_workers,
+                                    verbose=args.verbose, index_path=None if args.no_index else args.index)
+
+    if args.watch:
+        from watch_mode import watch_required_xls
+
+        # The watcher starts first, so files landing during the catch-up run are not missed
+        watch_required_xls(searched_files, args.source, args.dest, ignore_dirs=ignored_folders, case_sensitive=False,
+                           copy_mode=args.copy_mode, backend=args.watch_backend, poll_interval=args.poll_interval,
+                           workers=args.workers, copy_workers=args.copy_workers, catch_up=catch_up)
+    else:
+        catch_up()
@@ -0,0 +1,298 @@
+"""
+Watch mode for the file collection scripts
+==========================================
+
+Instead of crawling Path A by hand after the month closes, `watch_required_xls`
+keeps running and copies required `.xls` files within seconds of them being
+created or modified.
+
+Event sources
+-------------
+- "inotify": native filesystem events through `watchdog` (inotify on Linux,
+  ReadDirectoryChangesW on Windows). Optional dependency: `pip install watchdog`.
+- "poll": rescans Path A every `poll_interval` seconds with the indexed scandir
+  walker from `getMedidores_mod2.py`, so only folders whose mtime changed are
+  listed again, and compares size/mtime of the matched files. Use it on SMB
+  mounts, where native events are unreliable.
+- "auto" (default): "inotify" when `watchdog` is installed, "poll" otherwise.
+
+The event source starts before the optional catch-up run (`catch_up`), and the
+first poll pass reports every matched file, so a file that lands while the
+catch-up walk is running is still copied. Files already in Path B are skipped
+by the sync / replace copy modes.
+
+Events are debounced: a file is copied only after `debounce` seconds without
+new events for it, so a burst of writes to the same workbook triggers one copy.
+Files that become ready together are copied as one batch through
+`copy_pipeline.run_copy_pipeline`.
+"""
+
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Set, Tuple
+
+from copy_pipeline import PIPELINE_MODES, STORE_DIRNAME, run_copy_pipeline
+from filename_matcher import filename_matcher_from_entries
+from getMedidores_mod2 import parallel_scandir_walk
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional dependency, the polling backend still works
+    FileSystemEventHandler = object
+    Observer = None
+
+WATCH_BACKENDS = ("auto", "inotify", "poll")
+
+
+def name_a_destination(src_root: Path, dst_root: Path) -> Callable[[Path], Path]:
+    """
+    Destination rule of `collect_required_xls`: Path B / <first folder in the
+    relative path>, or Path B / '__ROOT__' for files directly under Path A.
+    """
+    def destination(src_file: Path) -> Path:
+        parts = src_file.parent.relative_to(src_root).parts
+        return dst_root / (parts[0] if parts else "__ROOT__")
+    return destination
+
+
+def poll_events(
+    src_root: Path,
+    ignore_set: Set[str],
+    is_required: Callable[[str], bool],
+    events: "queue.Queue[Path]",
+    stop: threading.Event,
+    poll_interval: float,
+    workers: int,
+) -> None:
+    """
+    Polling event source: puts every required file that appeared or changed
+    (size or mtime) since the previous pass into `events`. The first pass puts
+    every required file, so nothing that landed before it is missed.
+    """
+    index: Dict[str, dict] = {}
+    seen: Dict[str, Tuple[int, int]] = {}
+    while not stop.is_set():
+        current: Dict[str, Tuple[int, int]] = {}
+        for folder, filenames in parallel_scandir_walk(
+            src_root, ignore_set, workers=workers, index=index, keep_file=is_required
+        ):
+            for filename in filenames:
+                path = os.path.join(folder, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                current[path] = (st.st_size, st.st_mtime_ns)
+                if seen.get(path) != current[path]:
+                    events.put(Path(path))
+        seen = current
+        stop.wait(poll_interval)
+
+
+class RequiredFileHandler(FileSystemEventHandler):
+    """
+    watchdog handler that forwards created / modified / moved-in required files.
+    """
+
+    def __init__(self, src_root: Path, ignore_set: Set[str], is_required: Callable[[str], bool],
+                 events: "queue.Queue[Path]"):
+        super().__init__()
+        self.src_root = src_root
+        self.ignore_set = ignore_set
+        self.is_required = is_required
+        self.events = events
+
+    def _forward(self, path: str) -> None:
+        p = Path(path)
+        if not self.is_required(p.name):
+            return
+        try:
+            rel_parts = p.parent.relative_to(self.src_root).parts
+        except ValueError:
+            return
+        if any(part in self.ignore_set for part in rel_parts):
+            return
+        self.events.put(p)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._forward(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._forward(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._forward(event.dest_path)
+
+
+def watch_files(
+    required_filenames: Iterable[str],
+    path_a: str | Path,
+    destination_for: Callable[[Path], Path],
+    ignore_dirs: Tuple[str, ...] = (),
+    *,
+    case_sensitive: bool = False,
+    copy_mode: str = "sync",
+    store_dir: Path | None = None,
+    backend: str = "auto",
+    poll_interval: float = 10.0,
+    debounce: float = 2.0,
+    workers: int = 8,
+    copy_workers: int = 4,
+    stop_after: float | None = None,
+    catch_up: Callable[[], object] | None = None,
+) -> Dict[str, int]:
+    """
+    Watch Path A and copy required files to `destination_for(file)` as they land.
+
+    Runs until Ctrl+C, or for `stop_after` seconds if given. See the module
+    docstring for the backends and debouncing. `catch_up` (e.g. a
+    `collect_required_xls` run) is called once the event source is running,
+    before the first batch is copied, so events raised during it are kept.
+
+    In "sync" mode a modified file is kept next to its previous copies as
+    'name (k).xls', one more copy per save. Use copy_mode="replace" to keep a
+    single, latest copy of each file instead.
+
+    Returns
+    -------
+    Dict[str, int]
+        Totals over the whole session: 'batches', 'events' received, and the
+        per-outcome counts of `run_copy_pipeline` ('copied', 'skipped', ...).
+
+    Raises
+    ------
+    FileNotFoundError
+        If path_a does not exist or is not a directory.
+    ValueError
+        If `backend` or `copy_mode` is unknown.
+    RuntimeError
+        If backend="inotify" but `watchdog` is not installed.
+    """
+    if backend not in WATCH_BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Use one of {WATCH_BACKENDS}.")
+    if copy_mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown copy mode '{copy_mode}'. Use one of {PIPELINE_MODES}.")
+    if backend == "inotify" and Observer is None:
+        raise RuntimeError("backend='inotify' needs the 'watchdog' package (pip install watchdog).")
+    if backend == "auto":
+        backend = "inotify" if Observer is not None else "poll"
+
+    src_root = Path(path_a).resolve()
+    if not src_root.exists() or not src_root.is_dir():
+        raise FileNotFoundError(f"Path A does not exist or is not a directory: {src_root}")
+
+    matcher = filename_matcher_from_entries(required_filenames, case_sensitive=case_sensitive)
+
+    def is_required(filename: str) -> bool:
+        return filename.lower().endswith(".xls") and matcher(filename)
+
+    ignore_set = set(ignore_dirs)
+    events: "queue.Queue[Path]" = queue.Queue()
+    stop = threading.Event()
+
+    print("=== WATCH SETTINGS ===")
+    print(f"Path A (source): {src_root}")
+    print(f"Backend: {backend}" + (f" (every {poll_interval:g} s)" if backend == "poll" else ""))
+    print(f"Debounce: {debounce:g} s")
+    print(f"Copy mode: {copy_mode}")
+    print("======================\n")
+
+    observer = None
+    poller = None
+    if backend == "inotify":
+        observer = Observer()
+        observer.schedule(RequiredFileHandler(src_root, ignore_set, is_required, events), str(src_root), recursive=True)
+        observer.start()
+    else:
+        poller = threading.Thread(
+            target=poll_events,
+            args=(src_root, ignore_set, is_required, events, stop, poll_interval, workers),
+            daemon=True,
+        )
+        poller.start()
+
+    if catch_up is not None:
+        catch_up()
+
+    totals: Dict[str, int] = {"batches": 0, "events": 0}
+    last_event: Dict[Path, float] = {}
+    deadline = time.monotonic() + stop_after if stop_after is not None else None
+
+    def flush(ready: list) -> None:
+        results, stats = run_copy_pipeline(
+            ((p, destination_for(p)) for p in ready),
+            workers=copy_workers, mode=copy_mode, store_dir=store_dir,
+        )
+        totals["batches"] += 1
+        for key in ("copied", "renamed", "skipped", "deduped", "failed"):
+            totals[key] = totals.get(key, 0) + int(stats[key])
+        for src, dst, outcome in results:
+            if outcome != "skipped":
+                print(f"[WATCH] {outcome}: {src} -> {dst}")
+
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            # Collect events, waiting at most a fraction of the debounce window
+            try:
+                path = events.get(timeout=min(0.5, debounce) if debounce > 0 else 0.5)
+                last_event[path] = time.monotonic()
+                totals["events"] += 1
+                while True:
+                    path = events.get_nowait()
+                    last_event[path] = time.monotonic()
+                    totals["events"] += 1
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            ready = [p for p, t in last_event.items() if now - t >= debounce]
+            if ready:
+                for p in ready:
+                    del last_event[p]
+                ready = [p for p in ready if p.exists()]
+                if ready:
+                    flush(ready)
+    except KeyboardInterrupt:
+        print("\n[WATCH] Stopping.")
+    finally:
+        stop.set()
+        if observer is not None:
+            observer.stop()
+            observer.join()
+        if poller is not None:
+            poller.join(timeout=poll_interval + 1)
+
+    print(f"[WATCH] {totals['batches']} batch(es), {totals['events']} event(s): "
+          f"copied {totals.get('copied', 0)}, renamed {totals.get('renamed', 0)}, "
+          f"skipped {totals.get('skipped', 0)}, failed {totals.get('failed', 0)}")
+    return totals
+
+
+def watch_required_xls(
+    required_filenames: Tuple[str, ...],
+    path_a: str | Path,
+    path_b: str | Path,
+    ignore_dirs: Tuple[str, ...] = (),
+    **kwargs,
+) -> Dict[str, int]:
+    """
+    Watch-mode counterpart of `collect_required_xls`: new or modified required
+    files are copied into Path B / <Name A>. Keyword arguments are passed on to
+    `watch_files` (copy_mode defaults to "sync", so an unchanged file is never
+    copied twice and every saved change of a file adds another ' (k)' copy;
+    copy_mode="replace" keeps one, latest copy instead).
+    """
+    src_root = Path(path_a).resolve()
+    dst_root = Path(path_b).resolve()
+    dst_root.mkdir(parents=True, exist_ok=True)
+    return watch_files(
+        required_filenames, src_root, name_a_destination(src_root, dst_root), ignore_dirs,
+        store_dir=dst_root / STORE_DIRNAME, **kwargs,
+    )
@@ -2,6 +2,80 @@ import pandas as pd
 
 import json
 
+import os
+
+
+def load_homologations(homologation_paths):
+    """
+    Reads one or more homologation JSON files ({collected name: AF name}) into
+    a single mapping frame with one row per AF name.
+
+    Precedence: files are given from highest to lowest priority. When several
+    files (or several entries) map the same AF name, the first file wins, and
+    inside a file the last entry wins, as with the original one-by-one loop.
+
+    Returns:
+    - DataFrame with columns 'BAHIA', 'nombre' and 'source' (file it came from)
+    """
+    frames = []
+    for priority, path in enumerate(homologation_paths):
+        with open(path, 'r') as file:
+            homologation: dict = json.load(file)
+        frame = pd.DataFrame({'nombre': list(homologation.keys()), 'BAHIA': list(homologation.values())})
+        frame['source'] = os.path.basename(path)
+        frame['priority'] = priority
+        frame['order'] = -frame.index  # later entries of a file first
+        frames.append(frame)
+
+    mapping = pd.concat(frames, ignore_index=True)
+    mapping = mapping.sort_values(['priority', 'order'], kind='stable')
+    mapping = mapping.drop_duplicates('BAHIA', keep='first')
+    return mapping[['BAHIA', 'nombre', 'source']].reset_index(drop=True)
+
+def apply_homologations(af_df, collected_df, mapping):
+    """
+    Fills af_df['NOM'] with collected_df['nom'] for every mapped AF name, with
+    one indexed merge instead of one .at assignment per entry.
+    AF rows without a mapping keep NOM = None.
+    When a collected name appears more than once, its first row is used.
+    """
+    # A repeated name would duplicate AF rows in the merge and break the index map
+    repeated = collected_df.index.duplicated(keep='first')
+    if repeated.any():
+        print(f"[WARN] {int(repeated.sum())} repeated collected name(s), using the first row of each: "
+              f"{collected_df.index[repeated].unique().tolist()[:10]}")
+        collected_df = collected_df[~repeated]
+
+    mapping = mapping.merge(collected_df[['nom']], left_on='nombre', right_index=True, how='left')
+
+    missing = mapping['nom'].isna() & ~mapping['nombre'].isin(collected_df.index)
+    if missing.any():
+        print(f"[WARN] {int(missing.sum())} homologated name(s) not found in collected data: "
+              f"{mapping.loc[missing, 'nombre'].tolist()[:10]}")
+
+    unknown = ~mapping['BAHIA'].isin(af_df.index)
+    if unknown.any():
+        print(f"[WARN] {int(unknown.sum())} homologated AF name(s) not found in AF data (ignored): "
+              f"{mapping.loc[unknown, 'BAHIA'].tolist()[:10]}")
+
+    noms = mapping.set_index('BAHIA')['nom']
+    af_df = af_df.copy()
+    af_df['NOM'] = af_df.index.map(noms).astype(object)
+    af_df.loc[af_df['NOM'].isna(), 'NOM'] = None
+    return af_df
+
+def write_af_data(af_df, output_path, excel_path=None):
+    """
+    Writes the AF data as Parquet (fast) and, optionally, also as Excel.
+    Same columns as before: the index (BAHIA) is not written.
+    """
+    af_df.to_parquet(output_path, index=False)
+    print(f"AF data written to '{output_path}'")
+    if excel_path:
+        af_df.to_excel(excel_path, index=False)
+        print(f"AF data written to '{excel_path}'")
+
+
 if __name__ == '__main__':
 
     # Get data
@@ -10,17 +84,19 @@ if __name__ == '__main__':
 
     af_df = pd.read_parquet(r'input\in_parquet\af_df.parquet')
     af_df = af_df.set_index('BAHIA')
-    af_df['NOM'] = None
 
-    with open(r'output\homologated_names_t5.json', 'r') as file:
-        homologation:dict = json.load(file)
+    # Homologation files, highest priority first
+    homologation_files = [
+        r'output\homologated_names_t5.json',
+    ]
+    mapping = load_homologations(homologation_files)
 
     # Put TC
-    for collected_df_index, af_df_index in homologation.items():
-        af_df.at[af_df_index, 'NOM'] = collected_df.at[collected_df_index, 'nom']
+    af_df = apply_homologations(af_df, collected_df, mapping)
 
     print(af_df)
 
-    # Generate new AF data with column
-    excel_file_path = r'output\modified_excel_t2.xlsx'
-    af_df.to_excel(excel_file_path, index=False)
\ No newline at end of file
+    # Generate new AF data with column (Excel is optional and much slower)
+    parquet_file_path = r'output\modified_af_t2.parquet'
+    excel_file_path = None  # r'output\modified_excel_t2.xlsx'
+    write_af_data(af_df, parquet_file_path, excel_file_path)
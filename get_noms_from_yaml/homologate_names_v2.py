@@ -1,10 +1,12 @@
 import pandas as pd
 
-import re
+import numpy as np
 
 import json
 
-from collections import Counter
+from collections import Counter, defaultdict
+
+from homologation_rules import column_values, compile_bus_rules, compile_code_rules, load_rules, only_num
 
 
 def write_dict_to_txt_json(dictionary, filename):
@@ -15,14 +17,81 @@ def write_dict_to_txt_json(dictionary, filename):
     except IOError as e:
         print(f"Error writing to file '{filename}': {e}")
 
-def only_num(input_string):
-    return re.sub(r'[^0-9]', '', input_string)
+def homologate(collected_df, af_df, rules):
+    """
+    Relates collected rows (index 'nombre') to AF rows (index 'BAHIA') with the
+    rules of a rule file (see homologation_rules.yaml). Collected rows are
+    taken in order, and each one takes the first still-free AF row (in AF
+    order) that passes at least one bus rule and at least one code rule.
+
+    The rules are compiled once (homologation_rules.py). For each collected
+    row, the bus rules give a block of AF candidates (cached per distinct
+    idBarra), and the code rules are evaluated on the whole block at once as
+    numpy column predicates.
+
+    Returns:
+    - related_ones: dict collected name -> AF name
+    - fired_rules: dict collected name -> {'af', 'bus_rule', 'code_rule'}, the
+      first rule of each group that passed for the chosen pair
+    - coll_already_found, af_already_found: sets of matched names
+    """
+    bus_rules = compile_bus_rules(rules, af_df)
+
+    af_labels = list(af_df.index)
+    af_codes = [only_num(str(code)) for code in column_values(af_df, rules['codes']['af'])]
+    code_rules = compile_code_rules(rules, af_codes)
+
+    # Positions of every AF name: taking a name takes all its duplicates
+    positions_of = defaultdict(list)
+    for pos, label in enumerate(af_labels):
+        positions_of[label].append(pos)
+    taken = np.zeros(len(af_labels), dtype=bool)
 
-def multiple_replace(text, replacements):
-    # Create a regex pattern with all keys
-    pattern = re.compile("|".join(re.escape(k) for k in replacements.keys()))
-    # Replace using the dictionary
-    return pattern.sub(lambda match: replacements[match.group(0)], text)
+    related_ones = {}
+    fired_rules = {}
+    coll_already_found = set()
+    af_already_found = set()
+    blocks = {}
+
+    collected_rows = collected_df.reset_index().to_dict('records')
+    code_column = rules['codes']['collected']
+    for coll_index, row in zip(collected_df.index, collected_rows):
+        if coll_index in coll_already_found:
+            continue
+
+        # AF candidates of this row: union of the bus rules, in AF order
+        bus_hits = [rule(coll_index, row) for _, rule in bus_rules]
+        # Compiled rules return cached arrays, so their identity is a cheap cache key
+        key = tuple(id(positions) if positions is not None else None for positions in bus_hits)
+        block = blocks.get(key)
+        if block is None:
+            hits = [positions for positions in bus_hits if positions is not None]
+            block = np.unique(np.concatenate(hits)) if hits else np.empty(0, dtype=np.int64)
+            blocks[key] = block
+        if not len(block):
+            continue
+
+        coll_cod = only_num(str(row[code_column]))
+        code_masks = np.array([rule(coll_cod, block) for _, rule in code_rules])
+        valid = code_masks.any(axis=0) & ~taken[block]
+        if not valid.any():
+            continue
+
+        first = int(np.argmax(valid))
+        pos = block[first]
+        af_index = af_labels[pos]
+        related_ones[coll_index] = af_index
+        fired_rules[coll_index] = {
+            'af': af_index,
+            'bus_rule': next(name for (name, _), positions in zip(bus_rules, bus_hits)
+                             if positions is not None and pos in positions),
+            'code_rule': code_rules[int(np.argmax(code_masks[:, first]))][0],
+        }
+        coll_already_found.add(coll_index)
+        af_already_found.add(af_index)
+        taken[positions_of[af_index]] = True
+
+    return related_ones, fired_rules, coll_already_found, af_already_found
 
 
 if __name__ == '__main__':
@@ -34,40 +103,16 @@ if __name__ == '__main__':
     af_df = af_df.set_index('BAHIA')
 
     # Relate indexes by containing of idBarra in BAHIA and by only numbers of idBarra and IDELEMENT
-    related_ones = {}
-    coll_already_found = []
-    af_already_found = []
-
-    exception_nominations_in_af = {
-        'Name1': 'correction1',
-        'Name2': 'correction2'
-    }
-
-    for coll_index, coll_values in collected_df.iterrows():
-        if coll_index not in coll_already_found:
-            for af_index, af_values in af_df.iterrows():
-
-                if af_index not in af_already_found:
-
-                    coll_cod = only_num(coll_values['Cellcode'])
-                    af_cod = only_num(af_values['IDELEMENT'])
-
-                    if ((coll_values['idBarra'] in multiple_replace(af_index, exception_nominations_in_af)) or                                        
-                        (coll_index.startswith('name3') and (coll_values['idBarra'].replace('CHMB', 'CHIM') in af_index)) or     
-                        (af_values['NOMBRESUBESTACION']=='Place 1')
-                        ) and \
-                       (((coll_cod in af_cod) and (len(coll_cod)>2)) or
-                        ((af_cod.startswith(coll_cod)) and (len(coll_cod)<3)) or
-                        (abs(int(coll_cod) - int(af_cod))<3)
-                        )\
-                    :
-                    #if coll_index.startswith(af_values['NOMBRESUBESTACION']) and (only_num(coll_values['codCelda']) in only_num(af_values['IDELEMENT'])):
-                        
-                        related_ones[coll_index] = af_index
-                        
-                        coll_already_found.append(coll_index)
-                        af_already_found.append(af_index)
-                        break
+    # (rules and exceptions live in the rule file)
+    rules = load_rules(r'homologation_rules.yaml')
+
+    related_ones, fired_rules, coll_already_found, af_already_found = homologate(collected_df, af_df, rules)
+
+    fired_counts = Counter((fired['bus_rule'], fired['code_rule']) for fired in fired_rules.values())
+    print(f'🟩  {len(related_ones)} related, rules fired (bus rule, code rule):')
+    for (bus_rule, code_rule), count in fired_counts.most_common():
+        print(f'    {count:6}  {bus_rule} + {code_rule}')
+    print()
 
     not_in_af_records = ['place_exceptions']
     #not_in_af_records = []
@@ -81,5 +126,7 @@ if __name__ == '__main__':
     print(f'repetitions_not_found_collect:\n{repetitions}\n')
     
     print(f'🟨  {len(af_not_found)} af_not_found: \n{af_not_found}\n')
-            
-    #write_dict_to_txt_json(related_ones, r'output\homologated_names_t5.json')
+
+    # Homologation output, and next to it the rule pair that fired for every match
+    write_dict_to_txt_json(related_ones, r'output\homologated_names_t5.json')
+    write_dict_to_txt_json(fired_rules, r'output\homologated_rules_t5.json')
@@ -0,0 +1,145 @@
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+try:
+    import yaml
+except ImportError:  # optional dependency, JSON rule files still work
+    yaml = None
+
+
+BUS_RULE_TYPES = ('contains', 'af_equals')
+CODE_RULE_TYPES = ('contains', 'prefix', 'tolerance')
+
+# Digit codes longer than this do not fit in int64 and never match by tolerance
+MAX_CODE_DIGITS = 18
+
+
+def only_num(input_string):
+    return re.sub(r'[^0-9]', '', input_string)
+
+def compile_replacements(replacements):
+    if not replacements:
+        return lambda text: text
+    # Create a regex pattern with all keys, once
+    pattern = re.compile("|".join(re.escape(k) for k in replacements.keys()))
+    # Replace using the dictionary
+    return lambda text: pattern.sub(lambda match: replacements[match.group(0)], text)
+
+def load_rules(rules_path):
+    """
+    Reads a rule file (.yaml / .yml with PyYAML, or .json) and checks it.
+    See homologation_rules.yaml for the format.
+
+    Returns:
+    - dict with 'exceptions', 'bus_rules', 'codes' and 'code_rules'
+    """
+    with open(rules_path, 'r', encoding='utf-8') as file:
+        if os.path.splitext(rules_path)[1].lower() in ('.yaml', '.yml'):
+            if yaml is None:
+                raise RuntimeError(f"Reading '{rules_path}' needs PyYAML (pip install pyyaml), or use a .json rule file.")
+            rules = yaml.safe_load(file)
+        else:
+            rules = json.load(file)
+
+    rules.setdefault('exceptions', {})
+    for key in ('bus_rules', 'codes', 'code_rules'):
+        if key not in rules:
+            raise ValueError(f"Rule file '{rules_path}' has no '{key}' section.")
+    for rule in rules['bus_rules']:
+        if rule.get('type') not in BUS_RULE_TYPES:
+            raise ValueError(f"Bus rule '{rule.get('name')}' has unknown type '{rule.get('type')}'. Use one of {BUS_RULE_TYPES}.")
+    for rule in rules['code_rules']:
+        if rule.get('type') not in CODE_RULE_TYPES:
+            raise ValueError(f"Code rule '{rule.get('name')}' has unknown type '{rule.get('type')}'. Use one of {CODE_RULE_TYPES}.")
+    return rules
+
+def column_values(df, column):
+    """
+    Values of a column, or of the index when column is the index name.
+    """
+    if column == df.index.name:
+        return list(df.index)
+    return df[column].tolist()
+
+def compile_bus_rules(rules, af_df):
+    """
+    Compiles the bus rules against the AF table.
+
+    Each compiled rule is a function (collected name, collected row) -> sorted
+    AF positions where the rule passes, or None when the rule does not apply
+    to that row. 'contains' rules do one vectorized substring scan over the AF
+    column per distinct collected value and cache it; 'af_equals' rules are
+    computed once.
+
+    Returns:
+    - list of (rule name, compiled rule)
+    """
+    replace_exceptions = compile_replacements(rules['exceptions'])
+    compiled = []
+
+    for rule in rules['bus_rules']:
+        af_text = pd.Series([str(value) for value in column_values(af_df, rule['af'])])
+
+        if rule['type'] == 'af_equals':
+            positions = np.flatnonzero((af_text == str(rule['value'])).to_numpy())
+            compiled.append((rule['name'], lambda name, row, positions=positions: positions))
+            continue
+
+        if rule.get('af_exceptions'):
+            af_text = af_text.map(replace_exceptions)
+        replace_collected = compile_replacements(rule.get('collected_replace'))
+        prefix = rule.get('collected_name_startswith')
+        cache = {}
+
+        def contains(name, row, column=rule['collected'], af_text=af_text, replace_collected=replace_collected,
+                     prefix=prefix, cache=cache):
+            if prefix is not None and not name.startswith(prefix):
+                return None
+            value = replace_collected(str(row[column]))
+            if value not in cache:
+                cache[value] = np.flatnonzero(af_text.str.contains(value, regex=False).to_numpy())
+            return cache[value]
+
+        compiled.append((rule['name'], contains))
+
+    return compiled
+
+def compile_code_rules(rules, af_codes):
+    """
+    Compiles the code rules into vectorized predicates over a block of AF
+    candidates.
+
+    Each compiled rule is a function (collected digits, AF positions) -> bool
+    array, one value per position.
+
+    Returns:
+    - list of (rule name, compiled rule)
+    """
+    af_text = np.array(af_codes, dtype=str)
+    af_valid = np.array([0 < len(code) <= MAX_CODE_DIGITS for code in af_codes])
+    af_int = np.array([int(code) if valid else 0 for code, valid in zip(af_codes, af_valid)], dtype=np.int64)
+    compiled = []
+
+    for rule in rules['code_rules']:
+        if rule['type'] == 'contains':
+            def predicate(code, positions, min_length=rule.get('min_length', 0)):
+                if len(code) < min_length:
+                    return np.zeros(len(positions), dtype=bool)
+                return np.char.find(af_text[positions], code) >= 0
+        elif rule['type'] == 'prefix':
+            def predicate(code, positions, max_length=rule.get('max_length', MAX_CODE_DIGITS)):
+                if len(code) > max_length:
+                    return np.zeros(len(positions), dtype=bool)
+                return np.char.startswith(af_text[positions], code)
+        else:
+            def predicate(code, positions, max_difference=rule['max_difference']):
+                if not 0 < len(code) <= MAX_CODE_DIGITS:
+                    return np.zeros(len(positions), dtype=bool)
+                return af_valid[positions] & (np.abs(af_int[positions] - int(code)) <= max_difference)
+        compiled.append((rule['name'], predicate))
+
+    return compiled
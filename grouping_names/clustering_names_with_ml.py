@@ -1,9 +1,19 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans, AgglomerativeClustering
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer, CountVectorizer
+from sklearn.cluster import KMeans, MiniBatchKMeans, AgglomerativeClustering
 from sklearn.metrics import pairwise_distances_argmin_min
+from sklearn.preprocessing import normalize
+
+import argparse
+import json
+import os
+import time
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
 
 def get_parquet_column_as_list(parquet_filepath: str, column_name: str) -> list:
     """
@@ -36,50 +46,546 @@ def get_parquet_column_as_list(parquet_filepath: str, column_name: str) -> list:
         print(f"An error occurred: {e}")
         return []
 
-def save_clusters_to_text(dataframe, value_col_name, cluster_col_name, output_filepath):
+def save_clusters_to_text(dataframe, value_col_name, cluster_col_name, output_filepath,
+                          parquet_filepath=None, distance_col_name=None):
     """
     Saves cluster-separated data from a DataFrame to a single text file.
 
+    The rows are sorted by cluster once (stable, so each cluster keeps the
+    input order) and every cluster is written as one slice, instead of
+    filtering the whole DataFrame once per cluster.
+
     Args:
         dataframe (pd.DataFrame): The input DataFrame.
         value_col_name (str): The name of the column containing the values.
         cluster_col_name (str): The name of the column containing the cluster numbers.
         output_filepath (str): The path to the output text file.
+        parquet_filepath (str, optional): Also write a Parquet sidecar with the
+            columns name, cluster, distance (to the centroid) and cluster_size.
+        distance_col_name (str, optional): Column with the distance of each row
+            to its centroid. Without it the distance is left empty (NaN).
     """
-    with open(output_filepath, 'w') as f:
-        # Get unique cluster numbers and sort them for consistent output
-        unique_clusters = sorted(dataframe[cluster_col_name].unique())
+    clusters = dataframe[cluster_col_name].to_numpy()
+    order = np.argsort(clusters, kind='stable')
+    sorted_clusters = clusters[order]
+    sorted_values = dataframe[value_col_name].to_numpy()[order]
 
-        for cluster_num in unique_clusters:
-            # Filter the DataFrame for the current cluster
-            cluster_data = dataframe[dataframe[cluster_col_name] == cluster_num]
+    # Start of every cluster in the sorted rows, plus the end
+    bounds = np.flatnonzero(np.r_[True, sorted_clusters[1:] != sorted_clusters[:-1]])
+    bounds = np.r_[bounds[:len(order)], len(order)]
 
+    with open(output_filepath, 'w') as f:
+        for start, end in zip(bounds[:-1], bounds[1:]):
             # Write a header for the current cluster
-            f.write(f"--- Cluster {cluster_num} ---\n")
+            f.write(f"--- Cluster {sorted_clusters[start]} ---\n")
 
             # Write each value from the current cluster
-            for value in cluster_data[value_col_name]:
-                f.write(f"{value}\n")
+            f.write("".join(f"{value}\n" for value in sorted_values[start:end]))
             f.write("\n") # Add a blank line for separation between clusters
 
+    if parquet_filepath:
+        sizes = np.diff(bounds)
+        distances = (dataframe[distance_col_name].to_numpy()[order] if distance_col_name
+                     else np.full(len(order), np.nan))
+        pd.DataFrame({
+            "name": sorted_values,
+            "cluster": sorted_clusters,
+            "distance": distances,
+            "cluster_size": np.repeat(sizes, sizes),
+        }).to_parquet(parquet_filepath, index=False)
+
+def iter_parquet_column(parquet_filepath: str, column_name: str, batch_size: int = 10_000):
+    """
+    Yields a Parquet column in batches of at most batch_size values, without
+    loading the whole file.
+
+    Args:
+        parquet_filepath (str): The path to the Parquet file.
+        column_name (str): The name of the column to read.
+        batch_size (int): Rows per batch.
+
+    Yields:
+        list: The values of the next batch, as strings.
+    """
+    parquet_file = pq.ParquetFile(parquet_filepath)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=[column_name]):
+        yield [str(value) for value in batch.column(0).to_pylist()]
+
+def streaming_tfidf(parquet_filepath: str, column_name: str, batch_size: int = 10_000,
+                    n_features: int = 2 ** 13, sample_size: int = 0, random_state: int = 42):
+    """
+    Builds a TF-IDF transform with one streaming pass over the Parquet column.
+
+    A HashingVectorizer (same char 2-4-grams as the in-memory mode) needs no
+    vocabulary, so only the document frequency of each hash bucket is counted.
+    The IDF weights use the same smoothed formula as TfidfVectorizer. The same
+    pass keeps a uniform random sample of sample_size names (reservoir sampling).
+
+    Args:
+        parquet_filepath (str): The path to the Parquet file.
+        column_name (str): The column holding the names.
+        batch_size (int): Rows read per batch.
+        n_features (int): Hash buckets. Centroids are dense, so they take
+            n_clusters * n_features * 8 bytes.
+        sample_size (int): Names kept in the random sample.
+        random_state (int): Seed of the sample.
+
+    Returns:
+        tuple: (transform, n_rows, sample, idf_weights), where
+               transform(list_of_names) returns the L2-normalized TF-IDF rows
+               of one batch.
+    """
+    rng = np.random.default_rng(random_state)
+    sample = []
+    hasher = HashingVectorizer(analyzer='char', ngram_range=(2, 4), n_features=n_features,
+                               alternate_sign=False, norm=None)
+    doc_freq = np.zeros(n_features, dtype=np.int64)
+    n_rows = 0
+    for names in iter_parquet_column(parquet_filepath, column_name, batch_size):
+        counts = hasher.transform(names).tocsc()
+        doc_freq += np.diff(counts.indptr)
+        for name in names:
+            if len(sample) < sample_size:
+                sample.append(name)
+            else:
+                slot = rng.integers(n_rows + 1)
+                if slot < sample_size:
+                    sample[slot] = name
+            n_rows += 1
+
+    idf_weights = np.log((1 + n_rows) / (1 + doc_freq)) + 1
+    idf = sp.diags(idf_weights)
+
+    def transform(names: list):
+        return normalize(hasher.transform(names) @ idf)
+
+    return transform, n_rows, sample, idf_weights
+
+def minibatch_clustering(parquet_filepath: str, column_name: str, n_clusters: int, labels_path: str,
+                         batch_size: int = 10_000, n_features: int = 2 ** 13, epochs: int = 3,
+                         model_dir: str | None = None) -> str:
+    """
+    Streaming alternative to KMeans on the full TF-IDF matrix. Names are read
+    and labelled batch by batch and the labels are written to labels_path as
+    each batch is done, so nothing grows with the number of names.
+
+    Peak memory is about one batch (sparse TF-IDF rows and a batch_size x
+    n_clusters distance block) plus the dense centroids, which take
+    n_clusters * n_features * 8 bytes (40 MB for 600 clusters with the default
+    2**13 features; MiniBatchKMeans keeps a few copies while fitting).
+
+    1. One pass counts hashed n-gram document frequencies and keeps a random
+       sample of batch_size names (streaming_tfidf).
+    2. The centroids are seeded with k-means++ on that sample, so a file sorted
+       by name does not seed them all from its first rows.
+    3. `epochs` passes fit MiniBatchKMeans one batch at a time (partial_fit).
+    4. A last pass assigns every name to its nearest centroid and appends the
+       batch to labels_path.
+
+    Args:
+        parquet_filepath (str): The path to the Parquet file.
+        column_name (str): The column holding the names.
+        n_clusters (int): Number of clusters.
+        labels_path (str): Parquet file written with the columns "Names",
+            "cluster" and "distance" (to the centroid), in file order.
+        batch_size (int): Rows per batch; must be >= n_clusters.
+        n_features (int): Hash buckets of the vectorizer.
+        epochs (int): Fitting passes over the file.
+        model_dir (str, optional): Folder where the fitted model is saved
+            (see save_cluster_model).
+
+    Returns:
+        str: labels_path.
+    """
+    if batch_size < n_clusters:
+        raise ValueError(f"batch_size ({batch_size}) must be >= n_clusters ({n_clusters}).")
+
+    transform, n_rows, sample, idf_weights = streaming_tfidf(parquet_filepath, column_name, batch_size,
+                                                             n_features, sample_size=batch_size)
+    print(f'Streaming TF-IDF ready ({n_rows} names, {n_features} features)')
+    if n_rows < n_clusters:
+        raise ValueError(f"Only {n_rows} names for {n_clusters} clusters.")
+
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, batch_size=batch_size, n_init=1)
+    # The first partial_fit call seeds the centroids (k-means++)
+    kmeans.partial_fit(transform(sample))
+    del sample
+    for epoch in range(epochs):
+        for names in iter_parquet_column(parquet_filepath, column_name, batch_size):
+            kmeans.partial_fit(transform(names))
+        print(f'Epoch {epoch + 1}/{epochs} ready')
+    print('Clustering ready')
+    if model_dir:
+        save_cluster_model(model_dir, kmeans.cluster_centers_, idf_weights, n_features=n_features)
+
+    schema = pa.schema([("Names", pa.string()), ("cluster", pa.int32()), ("distance", pa.float64())])
+    with pq.ParquetWriter(labels_path, schema) as writer:
+        for names in iter_parquet_column(parquet_filepath, column_name, batch_size):
+            batch_labels, batch_distances = pairwise_distances_argmin_min(transform(names), kmeans.cluster_centers_)
+            writer.write_table(pa.table({"Names": names, "cluster": batch_labels.astype(np.int32),
+                                         "distance": batch_distances}, schema=schema))
+    print(f'Labels written to {labels_path}')
+    return labels_path
+
+def save_clusters_from_parquet(labels_path: str, value_col_name: str, cluster_col_name: str, output_filepath: str,
+                               parquet_filepath: str | None = None, distance_col_name: str | None = None,
+                               rows_per_pass: int = 100_000, batch_size: int = 10_000):
+    """
+    Same output as save_clusters_to_text, but reads the labels from a Parquet
+    file in batches instead of a DataFrame, so memory stays bounded.
+
+    One pass counts the size of every cluster. The clusters are then split
+    into consecutive ranges of at most rows_per_pass rows (a bigger cluster
+    gets a range of its own), and each range is collected with one more pass
+    over the file and written in cluster order (file order inside a cluster).
+
+    Args:
+        labels_path (str): Parquet file with the values and cluster numbers
+            (e.g. written by minibatch_clustering).
+        value_col_name (str): The name of the column containing the values.
+        cluster_col_name (str): The name of the column containing the cluster numbers.
+        output_filepath (str): The path to the output text file.
+        parquet_filepath (str, optional): Also write the Parquet sidecar with the
+            columns name, cluster, distance and cluster_size.
+        distance_col_name (str, optional): Column with the distance of each row
+            to its centroid. Without it the distance is left empty (NaN).
+        rows_per_pass (int): Rows held in memory per range of clusters.
+        batch_size (int): Rows read per batch.
+    """
+    labels_file = pq.ParquetFile(labels_path)
+    sizes = np.zeros(0, dtype=np.int64)
+    for batch in labels_file.iter_batches(batch_size=batch_size, columns=[cluster_col_name]):
+        counts = np.bincount(batch.column(0).to_numpy())
+        if len(counts) > len(sizes):
+            sizes = np.r_[sizes, np.zeros(len(counts) - len(sizes), dtype=np.int64)]
+        sizes[:len(counts)] += counts
+
+    # Consecutive cluster ranges [lo, hi) of at most rows_per_pass rows
+    ranges, lo, rows = [], 0, 0
+    for cluster, size in enumerate(sizes):
+        if rows and rows + size > rows_per_pass:
+            ranges.append((lo, cluster))
+            lo, rows = cluster, 0
+        rows += size
+    ranges.append((lo, len(sizes)))
+
+    columns = [value_col_name, cluster_col_name] + ([distance_col_name] if distance_col_name else [])
+    sidecar = None
+    if parquet_filepath:
+        sidecar = pq.ParquetWriter(parquet_filepath, pa.schema([
+            ("name", pa.string()), ("cluster", pa.int32()), ("distance", pa.float64()), ("cluster_size", pa.int64()),
+        ]))
+    try:
+        with open(output_filepath, 'w') as f:
+            for lo, hi in ranges:
+                values, clusters, distances = [], [], []
+                for batch in labels_file.iter_batches(batch_size=batch_size, columns=columns):
+                    batch_clusters = batch.column(1).to_numpy()
+                    keep = (batch_clusters >= lo) & (batch_clusters < hi)
+                    if keep.any():
+                        values.append(np.asarray(batch.column(0).to_pylist(), dtype=object)[keep])
+                        clusters.append(batch_clusters[keep])
+                        if distance_col_name:
+                            distances.append(batch.column(2).to_numpy()[keep])
+                if not clusters:
+                    continue
+                range_clusters = np.concatenate(clusters)
+                order = np.argsort(range_clusters, kind='stable')
+                range_clusters = range_clusters[order]
+                range_values = np.concatenate(values)[order]
+
+                bounds = np.flatnonzero(np.r_[True, range_clusters[1:] != range_clusters[:-1]])
+                bounds = np.r_[bounds, len(order)]
+                for start, end in zip(bounds[:-1], bounds[1:]):
+                    f.write(f"--- Cluster {range_clusters[start]} ---\n")
+                    f.write("".join(f"{value}\n" for value in range_values[start:end]))
+                    f.write("\n")
+
+                if sidecar is not None:
+                    sidecar.write_table(pa.table({
+                        "name": range_values.tolist(),
+                        "cluster": range_clusters.astype(np.int32),
+                        "distance": (np.concatenate(distances)[order] if distance_col_name
+                                     else np.full(len(order), np.nan)),
+                        "cluster_size": sizes[range_clusters],
+                    }, schema=sidecar.schema))
+    finally:
+        if sidecar is not None:
+            sidecar.close()
 
-texts = get_parquet_column_as_list(r"input/nominations.parquet", 'Nombre Señal')
+def kmeans_clustering(texts: list, n_clusters: int, model_dir: str | None = None) -> pd.DataFrame:
+    """
+    In-memory mode: full TF-IDF matrix and KMeans.
+
+    Args:
+        texts (list): The names to cluster.
+        n_clusters (int): Number of clusters.
+        model_dir (str, optional): Folder where the fitted model is saved
+            (see save_cluster_model).
+
+    Returns:
+        pd.DataFrame: Columns "Names", "cluster" and "distance" (to the
+                      centroid), in input order.
+    """
+    # Convert texts to numerical vectors
+    vectorizer = TfidfVectorizer(analyzer='char', ngram_range=(2, 4))  # use char-level n-grams for typo tolerance
+    X = vectorizer.fit_transform(texts)
+    print('Convertion to numerical vectors is ready')
+
+    # Cluster using KMeans
+    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init='auto')
+    kmeans.fit(X)
+    print('Clustering ready')
+    if model_dir:
+        save_cluster_model(model_dir, kmeans.cluster_centers_, vectorizer.idf_,
+                           vocabulary={gram: int(col) for gram, col in vectorizer.vocabulary_.items()})
+
+    # View clusters
+    _, distances = pairwise_distances_argmin_min(X, kmeans.cluster_centers_)
+    return pd.DataFrame({"Names": texts, "cluster": kmeans.labels_, "distance": distances})
+
+def save_cluster_model(model_dir: str, centroids: np.ndarray, idf_weights: np.ndarray,
+                       vocabulary: dict | None = None, n_features: int | None = None):
+    """
+    Saves what is needed to place new names without refitting:
+
+    - model.json: vectorizer settings and either the n-gram vocabulary
+      (kmeans mode) or the number of hash buckets (minibatch mode)
+    - idf.npy: IDF weight of every feature
+    - centroids.npy: one row per cluster, plus centroid_norms.npy (squared norms)
+
+    The .npy files are memory-mapped by load_cluster_model.
+
+    Args:
+        model_dir (str): Output folder (created if needed).
+        centroids (np.ndarray): Cluster centres, shape (n_clusters, n_features).
+        idf_weights (np.ndarray): IDF weights, shape (n_features,).
+        vocabulary (dict, optional): n-gram -> feature column.
+        n_features (int, optional): Hash buckets, when there is no vocabulary.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    centroids = np.asarray(centroids, dtype=np.float64)
+    np.save(os.path.join(model_dir, "centroids.npy"), centroids)
+    np.save(os.path.join(model_dir, "centroid_norms.npy"), np.einsum('ij,ij->i', centroids, centroids))
+    np.save(os.path.join(model_dir, "idf.npy"), np.asarray(idf_weights, dtype=np.float64))
+    settings = {
+        "analyzer": "char",
+        "ngram_range": [2, 4],
+        "n_clusters": int(centroids.shape[0]),
+        "vocabulary": vocabulary,
+        "n_features": n_features,
+    }
+    with open(os.path.join(model_dir, "model.json"), 'w', encoding='utf-8') as f:
+        json.dump(settings, f, ensure_ascii=False)
+    print(f'Model saved to {model_dir} ({centroids.shape[0]} clusters, {centroids.shape[1]} features)')
+
+def load_cluster_model(model_dir: str) -> dict:
+    """
+    Loads a model written by save_cluster_model. Centroids and IDF weights are
+    memory-mapped, so only the pages that are used get read from disk.
+
+    Args:
+        model_dir (str): Folder written by save_cluster_model.
+
+    Returns:
+        dict: "vectorizer" (raw n-gram counts: CountVectorizer with the saved
+              vocabulary, or HashingVectorizer), "idf", "centroids" and
+              "centroid_norms".
+    """
+    with open(os.path.join(model_dir, "model.json"), 'r', encoding='utf-8') as f:
+        settings = json.load(f)
+    ngram_range = tuple(settings["ngram_range"])
+    if settings["vocabulary"] is not None:
+        vectorizer = CountVectorizer(analyzer=settings["analyzer"], ngram_range=ngram_range,
+                                     vocabulary=settings["vocabulary"])
+    else:
+        vectorizer = HashingVectorizer(analyzer=settings["analyzer"], ngram_range=ngram_range,
+                                       n_features=settings["n_features"], alternate_sign=False, norm=None)
+    return {
+        "vectorizer": vectorizer,
+        "idf": np.load(os.path.join(model_dir, "idf.npy"), mmap_mode='r'),
+        "centroids": np.load(os.path.join(model_dir, "centroids.npy"), mmap_mode='r'),
+        "centroid_norms": np.load(os.path.join(model_dir, "centroid_norms.npy"), mmap_mode='r'),
+    }
+
+def assign_clusters(names: list, model: dict, batch_size: int = 10_000) -> tuple:
+    """
+    Places names in the nearest cluster of a saved model (no refitting).
+
+    Rows are L2-normalized TF-IDF vectors, as when fitting, and the squared
+    distance to a centroid c is |x|^2 - 2 * x.c + |c|^2. |x|^2 is computed per
+    row: a name with no n-gram in the saved vocabulary has a zero row.
 
-# Convert texts to numerical vectors
-vectorizer = TfidfVectorizer(analyzer='char', ngram_range=(2, 4))  # use char-level n-grams for typo tolerance
-X = vectorizer.fit_transform(texts)
-print('Convertion to numerical vectors is ready')
+    Args:
+        names (list): The names to place.
+        model (dict): Output of load_cluster_model.
+        batch_size (int): Names vectorized at once.
+
+    Returns:
+        tuple: (labels, distances), numpy arrays aligned with names.
+    """
+    idf = sp.diags(np.asarray(model["idf"]))
+    centroids_t = model["centroids"].T
+    norms = np.asarray(model["centroid_norms"])
+    labels, distances = [], []
+    for start in range(0, len(names), batch_size):
+        X = normalize(model["vectorizer"].transform(names[start:start + batch_size]) @ idf)
+        row_norms = np.asarray(X.multiply(X).sum(axis=1))
+        squared = row_norms - 2 * (X @ centroids_t) + norms
+        best = np.argmin(squared, axis=1)
+        labels.append(best)
+        distances.append(np.sqrt(np.maximum(squared[np.arange(len(best)), best], 0)))
+    if not labels:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(labels), np.concatenate(distances)
+
+def read_names(filepath: str, column_name: str) -> list:
+    """
+    Reads names from a Parquet file (column_name) or a text file (one per line).
+    """
+    if filepath.lower().endswith(".parquet"):
+        return get_parquet_column_as_list(filepath, column_name)
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+# Set bits of every byte value, to count differing signature bits
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def lsh_graph_clustering(texts: list, similarity_threshold: float = 0.7, n_tables: int = 32,
+                         window: int = 10, random_state: int = 42) -> pd.DataFrame:
+    """
+    Groups names without choosing a number of clusters: builds an approximate
+    k-NN graph over the TF-IDF vectors with random-projection LSH, keeps the
+    edges with cosine similarity >= similarity_threshold and returns the
+    connected components as clusters.
+
+    1. Every vector gets a 64-bit signature: the signs of 64 random
+       projections. Two vectors whose signatures differ in h bits have a
+       cosine similarity of about cos(pi * h / 64).
+    2. For each of n_tables random bit orders, rows are sorted by their
+       reordered signature and each row is paired with the next `window` rows.
+       Similar names share most bits, so they often end up close together.
+    3. Pairs whose estimated similarity is clearly below the threshold are
+       dropped; the rest get their exact cosine similarity.
+
+    Each table costs one sort plus n * window bit comparisons, so the total is
+    about n * log(n) instead of n^2.
+
+    Components are single-linkage: a chain of similar names ends up in one
+    group. Raise similarity_threshold if unrelated names get merged, and raise
+    n_tables or window if variants of the same name stay apart.
 
-# Cluster using KMeans
-n_clusters = 600
-kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init='auto')
-kmeans.fit(X)
-print('Clustering ready')
+    Args:
+        texts (list): The names to cluster.
+        similarity_threshold (float): Minimum cosine similarity of an edge (0-1).
+        n_tables (int): Random bit orders (sorts) used to find candidate pairs.
+        window (int): Neighbours paired with each row in every sort.
+        random_state (int): Seed of the projections and bit orders.
+
+    Returns:
+        pd.DataFrame: Columns "Names" and "cluster", in input order.
+    """
+    vectorizer = TfidfVectorizer(analyzer='char', ngram_range=(2, 4))
+    X = vectorizer.fit_transform(texts).tocsr()  # rows are L2-normalized, so dot product = cosine
+    n = X.shape[0]
+    print('Convertion to numerical vectors is ready')
+
+    rng = np.random.default_rng(random_state)
+    bits = (X @ rng.standard_normal((X.shape[1], 64), dtype=np.float32)) > 0
+    signatures = np.packbits(bits, axis=1)  # n x 8 bytes
+
+    # Largest number of differing bits still compatible with the threshold (with slack)
+    max_angle = np.arccos(max(similarity_threshold - 0.05, -1.0))
+    max_bits = int(np.ceil(64 * max_angle / np.pi))
+
+    pair_codes = []
+    for _ in range(n_tables):
+        keys = np.ascontiguousarray(np.packbits(bits[:, rng.permutation(64)], axis=1)).view('>u8').ravel()
+        order = np.argsort(keys, kind='stable')
+        for offset in range(1, min(window, n - 1) + 1):
+            left, right = order[:-offset], order[offset:]
+            differing = POPCOUNT_TABLE[signatures[left] ^ signatures[right]].sum(axis=1)
+            close = differing <= max_bits
+            a, b = left[close], right[close]
+            pair_codes.append(np.minimum(a, b) * n + np.maximum(a, b))
+        # Drop pairs found by several tables (sort-based, cheaper than np.unique here)
+        codes = np.sort(np.concatenate(pair_codes))
+        pair_codes = [codes[np.r_[True, codes[1:] != codes[:-1]]]]
+    pair_codes = pair_codes[0] if pair_codes else np.empty(0, dtype=np.int64)
+
+    # Exact similarity of the candidate pairs, in blocks to bound memory
+    rows, cols = [], []
+    for start in range(0, len(pair_codes), 100_000):
+        a, b = np.divmod(pair_codes[start:start + 100_000], n)
+        sims = np.asarray(X[a].multiply(X[b]).sum(axis=1)).ravel()
+        keep = sims >= similarity_threshold
+        rows.append(a[keep])
+        cols.append(b[keep])
+    rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.empty(0, dtype=np.int64)
+
+    graph = sp.coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n))
+    n_groups, labels = connected_components(graph, directed=False)
+    print(f'Clustering ready ({len(pair_codes)} candidate pairs, {len(rows)} edges, {n_groups} groups)')
+    return pd.DataFrame({"Names": texts, "cluster": labels})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cluster signal names, or place new names in saved clusters.")
+    parser.add_argument("command", nargs="?", default="fit", choices=("fit", "assign"),
+                        help="fit: cluster the whole list (and save the model with --model). "
+                             "assign: place new names with a saved model, without refitting.")
+    parser.add_argument("--input", default=r"input/nominations.parquet",
+                        help="Parquet file (uses --column) or text file with one name per line")
+    parser.add_argument("--column", default='Nombre Señal')
+    # "kmeans" (whole matrix in memory), "minibatch" (streaming, bounded memory)
+    # or "lsh-graph" (no n_clusters, groups come from a similarity threshold)
+    parser.add_argument("--mode", default="kmeans", choices=("kmeans", "minibatch", "lsh-graph"))
+    parser.add_argument("--n-clusters", type=int, default=600)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--n-features", type=int, default=2 ** 13, help="Hash buckets of the minibatch mode")
+    parser.add_argument("--similarity-threshold", type=float, default=0.7)
+    parser.add_argument("--model", default=None, help="Model folder written by fit / read by assign")
+    parser.add_argument("--output", default=None, help="Cluster text file (default: output/<n>cluster_results.txt)")
+    args = parser.parse_args()
+
+    if args.command == "assign":
+        if not args.model:
+            parser.error("assign needs --model (a folder written by 'fit --model').")
+        names = read_names(args.input, args.column)
+        model = load_cluster_model(args.model)
+        start = time.perf_counter()
+        labels, distances = assign_clusters(names, model, args.batch_size)
+        print(f'Assigned {len(names)} name(s) in {(time.perf_counter() - start) * 1000:.1f} ms')
+        df = pd.DataFrame({"Names": names, "cluster": labels, "distance": distances})
+        output = args.output or r'output/assigned_cluster_results.txt'
+    else:
+        n_clusters = args.n_clusters
+        if args.mode == "minibatch":
+            # Labels are streamed to disk and the outputs are written from there, never as one DataFrame
+            df = None
+            labels_path = os.path.splitext(args.output or fr'output/{n_clusters}cluster_results.txt')[0] + "_labels.parquet"
+            minibatch_clustering(args.input, args.column, n_clusters, labels_path, batch_size=args.batch_size,
+                                 n_features=args.n_features, model_dir=args.model)
+        elif args.mode == "lsh-graph":
+            if args.model:
+                parser.error("--mode lsh-graph has no centroids to save; use kmeans or minibatch with --model.")
+            texts = read_names(args.input, args.column)
+            df = lsh_graph_clustering(texts, similarity_threshold=args.similarity_threshold)
+            n_clusters = df["cluster"].nunique()
+        else:
+            texts = read_names(args.input, args.column)
+            df = kmeans_clustering(texts, n_clusters, model_dir=args.model)
 
-# View clusters
-df = pd.DataFrame({"Names": texts, "cluster": kmeans.labels_})
+        # print(df.sort_values("cluster"))
 
-# print(df.sort_values("cluster"))
+        output = args.output or fr'output/{n_clusters}cluster_results.txt'
 
-# Generating txt to show clusters
-save_clusters_to_text(df, 'Names', "cluster", fr'output\{n_clusters}cluster_results.txt')
\ No newline at end of file
+    # Generating txt to show clusters, plus the Parquet sidecar next to it
+    if df is None:
+        save_clusters_from_parquet(labels_path, 'Names', "cluster", output,
+                                   parquet_filepath=os.path.splitext(output)[0] + ".parquet",
+                                   distance_col_name="distance", batch_size=args.batch_size)
+    else:
+        save_clusters_to_text(df, 'Names', "cluster", output,
+                              parquet_filepath=os.path.splitext(output)[0] + ".parquet",
+                              distance_col_name="distance" if "distance" in df.columns else None)
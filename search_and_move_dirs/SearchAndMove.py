@@ -1,42 +1,90 @@
 import os
-import shutil
+import sys
+from pathlib import Path
 
-def copy_xls_files(file_names, source_folder, destination_folder):
+# The copy pipeline and filename matcher are shared with the meter collector in ../get_meters_info
+sys.path.append(str(Path(__file__).resolve().parent.parent / "get_meters_info"))
+from copy_pipeline import run_copy_pipeline
+from filename_matcher import filename_matcher_from_entries
+
+
+def copy_xls_files(file_names, source_folder, destination_folder, workers=8, verbose=False):
     """
     Search for .xls files by name inside source_folder (including subfolders)
     and copy them to destination_folder.
 
+    Files are copied on a thread pool while the search goes on, and the
+    aggregate throughput (MB/s, files/s) is printed at the end.
+
     Parameters:
     - file_names (list[str]): List of .xls filenames to search for (case-insensitive).
+      Entries may also be glob patterns ('*_medidor_*.xls') or regexes prefixed with 're:'.
     - source_folder (str): Path to search in (including subfolders).
     - destination_folder (str): Path where found files will be copied.
+    - workers (int): Number of concurrent copies.
+    - verbose (bool): Print every copied file (slow on trees with many matches).
     """
-    # Normalize file names for case-insensitive match
-    file_names_lower = [name.lower() for name in file_names]
+    # Compile names and patterns once for case-insensitive match (hashed set + one regex)
+    is_wanted = filename_matcher_from_entries(file_names, case_sensitive=False)
 
     if not os.path.exists(destination_folder):
         os.makedirs(destination_folder)
 
-    found_count = 0
+    destination = Path(destination_folder)
 
-    for root, _, files in os.walk(source_folder):
-        for file in files:
-            if file.lower() in file_names_lower:
-                source_path = os.path.join(root, file)
-                dest_path = os.path.join(destination_folder, file)
+    def found_files():
+        for root, _, files in os.walk(source_folder):
+            for file in files:
+                if is_wanted(file):
+                    yield Path(root) / file, destination
 
-                shutil.copy2(source_path, dest_path)  # keep metadata
-                found_count += 1
-                print(f"Copied: {source_path} → {dest_path}")
+    # "overwrite" keeps the previous behaviour: same name → replaced, metadata kept
+    results, _ = run_copy_pipeline(found_files(), workers=workers, mode="overwrite")
+
+    found_count = 0
+    for source_path, dest_path, outcome in results:
+        if outcome == "failed":
+            continue
+        found_count += 1
+        if verbose:
+            print(f"Copied: {source_path} → {dest_path}")
 
     print(f"Total files copied: {found_count}/{len(file_names)}")
 
-files_to_find = [
-    'files_to_find.xls'
-]
 
-source_dir = r"source_dir"
-destination_dir = r"C:\destination_dir"
+def watch_xls_files(file_names, source_folder, destination_folder, backend="auto", poll_interval=10.0, debounce=2.0):
+    """
+    Keep running and copy the wanted .xls files to destination_folder as soon as
+    they are created or modified inside source_folder (see
+    ../get_meters_info/watch_mode.py for the backends). Stop with Ctrl+C.
+
+    Parameters:
+    - file_names (list[str]): Same entries as in copy_xls_files.
+    - source_folder (str): Path to watch (including subfolders).
+    - destination_folder (str): Path where files will be copied (replaced if present).
+    - backend (str): "auto", "inotify" (needs watchdog) or "poll" (use on SMB mounts).
+    - poll_interval (float): Seconds between scans with the "poll" backend.
+    - debounce (float): Seconds without new events before a file is copied.
+    """
+    from watch_mode import watch_files
+
+    if not os.path.exists(destination_folder):
+        os.makedirs(destination_folder)
+
+    destination = Path(destination_folder)
+    return watch_files(
+        file_names, source_folder, lambda _: destination,
+        case_sensitive=False, copy_mode="overwrite",
+        backend=backend, poll_interval=poll_interval, debounce=debounce,
+    )
+
+
+if __name__ == "__main__":
+    files_to_find = [
+        'files_to_find.xls'
+    ]
 
-copy_xls_files(files_to_find, source_dir, destination_dir)
+    source_dir = r"source_dir"
+    destination_dir = r"C:\destination_dir"
 
+    copy_xls_files(files_to_find, source_dir, destination_dir)